@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Local color composition of multi-band FITS cutouts.
+
+A Legacy Survey FITS cutout holds one image plane per band, so a single FITS download can give both the science data
+and, composed here, the color display image which would otherwise require a separate JPEG cutout request.
+
+@author: Aaron Meisner, Noah Schapera, Austin Humphreys
+"""
+
+import numpy as np
+from PIL import Image
+
+# (red, green, blue) weight of each band, following the Legacy Survey viewer color scales
+default_band_weights = {
+    "g": (0.0, 0.0, 6.0),
+    "r": (0.0, 3.4, 0.0),
+    "i": (1.0, 0.0, 0.0),
+    "z": (2.2, 0.0, 0.0),
+}
+
+def getBandNames(header, band_count):
+    """
+    Read the name of each plane of a FITS cube from its BAND0, BAND1, ... header keywords.
+
+    Parameters
+    ----------
+        header : astropy.io.fits.Header
+            Header of the cube.
+        band_count : int
+            Number of planes in the cube.
+
+    Returns
+    -------
+        bands : list of str or None
+            Band name of each plane, or None if the header does not name every plane.
+    """
+
+    bands = [header.get(f"BAND{index}") for index in range(band_count)]
+    if (None in bands):
+        return None
+    return [str(band).strip() for band in bands]
+
+def mixingMatrix(bands, band_weights=None):
+    """
+    Build the (3, B) matrix projecting the planes of a cube onto the red, green and blue channels.
+
+    Parameters
+    ----------
+        bands : list of str
+            Band name of each plane.
+        band_weights : dict, optional
+            (red, green, blue) weight of each band. Defaults to default_band_weights.
+
+    Returns
+    -------
+        mixing_matrix : numpy.ndarray
+            Array of shape (3, B).
+    """
+
+    if (band_weights is None):
+        band_weights = default_band_weights
+
+    missing_bands = [band for band in bands if band not in band_weights]
+    if (len(missing_bands) > 0):
+        raise ValueError(f"No color weights for the bands: {missing_bands}. Weighted bands are: {list(band_weights.keys())}.")
+
+    return np.array([band_weights[band] for band in bands], dtype=np.float64).T
+
+def composeRGB(cube, bands, band_weights=None, stretch="asinh", Q=20.0, minimum=0.0, maximum=1.0):
+    """
+    Compose a multi-band cube into an RGB image in one vectorized pass.
+
+    Parameters
+    ----------
+        cube : array_like
+            Image planes with shape (B, H, W), in FITS orientation (row 0 is the southern edge).
+        bands : list of str
+            Band name of each plane.
+        band_weights : dict, optional
+            (red, green, blue) weight of each band. Defaults to default_band_weights.
+        stretch : str, optional
+            "asinh" to compress the intensity with an arcsinh stretch while preserving colors, or "linear". Defaults to
+            "asinh".
+        Q : float, optional
+            Softening of the asinh stretch, larger values compress bright sources more. Defaults to 20.
+        minimum, maximum : float, optional
+            Weighted (and stretched) values mapped to 0 and 255. Defaults to 0 and 1.
+
+    Returns
+    -------
+        rgb_data : numpy.ndarray
+            (H, W, 3) uint8 array, flipped so that north is up.
+    """
+
+    if (stretch not in ["asinh", "linear"]):
+        raise ValueError(f"Invalid stretch: {stretch}. The available stretches are: asinh, linear.")
+
+    cube = np.nan_to_num(np.asarray(cube, dtype=np.float64))
+    if (cube.ndim == 2):
+        cube = cube[None]
+    if (cube.ndim != 3 or cube.shape[0] != len(bands)):
+        raise ValueError(f"The cube must have shape ({len(bands)}, H, W), not {cube.shape}.")
+
+    rgb = np.einsum("cb,bhw->hwc", mixingMatrix(bands, band_weights), cube, optimize=True)
+
+    if (stretch == "asinh"):
+        # Scaling every channel by the stretched mean intensity keeps the colors of saturated sources
+        intensity = np.maximum(rgb.mean(axis=-1, keepdims=True), 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            factor = np.where(intensity > 0, np.arcsinh(Q * intensity) / (Q * intensity), 1.0)
+        rgb *= factor
+
+    rgb = (rgb - minimum) / (maximum - minimum)
+    rgb_data = (np.clip(rgb, 0, 1) * 255).round().astype(np.uint8)
+
+    return rgb_data[::-1]
+
+def composeImage(cube, bands, band_weights=None, stretch="asinh", Q=20.0, minimum=0.0, maximum=1.0):
+    """
+    Compose a multi-band cube into an RGB PIL image, see composeRGB.
+    """
+
+    return Image.fromarray(composeRGB(cube, bands, band_weights, stretch, Q, minimum, maximum))
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Local equivalents of the WiseView difference imaging and motion emphasis modes.
+
+These functions operate on stacks of epoch cutouts, shaped (N, H, W), with one MJD per epoch, so that parameter sweeps
+over diff, diff_window, window, shift, pmx and pmy can be run locally instead of re-rendering through the WiseView service.
+
+@author: Aaron Meisner, Noah Schapera, Austin Humphreys
+"""
+
+import numpy as np
+
+days_per_year = 365.25
+
+def asEpochStack(stack):
+    """
+    Convert a sequence of epoch cutouts into a float (N, H, W) array, replacing NaNs with zeros.
+
+    Parameters
+    ----------
+        stack : array_like
+            Epoch cutouts with shape (N, H, W).
+
+    Returns
+    -------
+        epoch_stack : numpy.ndarray
+            Float array of shape (N, H, W).
+    """
+
+    epoch_stack = np.asarray(stack, dtype=np.float64)
+    if (epoch_stack.ndim != 3):
+        raise ValueError(f"The epoch stack must have shape (N, H, W), not {epoch_stack.shape}.")
+
+    return np.nan_to_num(epoch_stack)
+
+def differenceEpochs(stack, reference="previous", diff_window=1):
+    """
+    Create difference images from a stack of epoch cutouts.
+
+    Parameters
+    ----------
+        stack : array_like
+            Epoch cutouts with shape (N, H, W).
+        reference : str or int, optional
+            What each epoch is differenced against. "previous" subtracts the mean of the diff_window epochs preceding
+            each epoch, "first" subtracts the first epoch, "mean" subtracts the mean of all epochs and an integer subtracts
+            the epoch at that index. Defaults to "previous".
+        diff_window : int, optional
+            Number of preceding epochs averaged together for the "previous" reference. Defaults to 1.
+
+    Returns
+    -------
+        difference_stack : numpy.ndarray
+            Difference images. For the "previous" reference, the first diff_window epochs have no reference and are
+            dropped, so the result has shape (N - diff_window, H, W). Otherwise the shape is (N, H, W).
+    """
+
+    epoch_stack = asEpochStack(stack)
+
+    if (reference == "previous"):
+        if (diff_window < 1 or diff_window >= epoch_stack.shape[0]):
+            raise ValueError(f"The diff_window must be in the range [1, {epoch_stack.shape[0] - 1}].")
+
+        # Running sums give every windowed mean at once
+        cumulative_sum = np.cumsum(epoch_stack, axis=0)
+        cumulative_sum = np.concatenate((np.zeros_like(epoch_stack[:1]), cumulative_sum), axis=0)
+        window_means = (cumulative_sum[diff_window:-1] - cumulative_sum[:-diff_window - 1]) / diff_window
+        return epoch_stack[diff_window:] - window_means
+    elif (reference == "first"):
+        return epoch_stack - epoch_stack[0]
+    elif (reference == "mean"):
+        return epoch_stack - epoch_stack.mean(axis=0)
+    elif (isinstance(reference, (int, np.integer))):
+        return epoch_stack - epoch_stack[reference]
+    else:
+        raise ValueError(f"Invalid reference: {reference}. Should be 'previous', 'first', 'mean', or an epoch index.")
+
+def windowedCoadd(stack, mjds, window=0.5):
+    """
+    Co-add the epochs which fall within the same time window, like the WiseView window parameter.
+
+    Parameters
+    ----------
+        stack : array_like
+            Epoch cutouts with shape (N, H, W).
+        mjds : array_like
+            MJD of each epoch, with shape (N,).
+        window : float, optional
+            Width of each co-addition window in years. Defaults to 0.5.
+
+    Returns
+    -------
+        coadd_stack : numpy.ndarray
+            Mean of the epochs in each non-empty window, with shape (G, H, W), in chronological order.
+        coadd_mjds : numpy.ndarray
+            Mean MJD of the epochs in each window, with shape (G,).
+    """
+
+    epoch_stack = asEpochStack(stack)
+    mjds = np.asarray(mjds, dtype=np.float64)
+
+    if (mjds.shape != (epoch_stack.shape[0],)):
+        raise ValueError("There must be exactly one MJD per epoch.")
+
+    if (window <= 0):
+        raise ValueError("The window must be a positive number of years.")
+
+    window_indices = np.floor((mjds - mjds.min()) / (window * days_per_year)).astype(np.int64)
+    unique_windows, group_indices = np.unique(window_indices, return_inverse=True)
+    group_count = len(unique_windows)
+
+    counts = np.bincount(group_indices, minlength=group_count)
+    coadd_stack = np.zeros((group_count, *epoch_stack.shape[1:]), dtype=np.float64)
+    np.add.at(coadd_stack, group_indices, epoch_stack)
+    coadd_stack /= counts[:, None, None]
+
+    coadd_mjds = np.bincount(group_indices, weights=mjds, minlength=group_count) / counts
+
+    return coadd_stack, coadd_mjds
+
+def motionOffsets(mjds, pmx, pmy, reference_mjd=None):
+    """
+    Pixel offsets of a moving source at each epoch, for one or more proper motion hypotheses.
+
+    Parameters
+    ----------
+        mjds : array_like
+            MJD of each epoch, with shape (N,).
+        pmx : float or array_like
+            Proper motion along the image x axis (columns) in pixels per year, scalar or shape (M,).
+        pmy : float or array_like
+            Proper motion along the image y axis (rows) in pixels per year, scalar or shape (M,).
+        reference_mjd : float, optional
+            MJD at which the offset is zero. Defaults to the first MJD.
+
+    Returns
+    -------
+        dx, dy : numpy.ndarray
+            Offsets in pixels with shape (M, N).
+    """
+
+    mjds = np.asarray(mjds, dtype=np.float64)
+    if (reference_mjd is None):
+        reference_mjd = mjds[0]
+
+    years = (mjds - reference_mjd) / days_per_year
+    pmx = np.atleast_1d(np.asarray(pmx, dtype=np.float64))
+    pmy = np.atleast_1d(np.asarray(pmy, dtype=np.float64))
+    pmx, pmy = np.broadcast_arrays(pmx, pmy)
+
+    dx = pmx[:, None] * years[None, :]
+    dy = pmy[:, None] * years[None, :]
+
+    return dx, dy
+
+def fourierShiftKernels(shape, dx, dy):
+    """
+    Separable Fourier phase ramps which shift images by (dx, dy) pixels.
+
+    Parameters
+    ----------
+        shape : tuple
+            (H, W) shape of the images.
+        dx, dy : numpy.ndarray
+            Shifts in pixels, with matching shapes.
+
+    Returns
+    -------
+        x_kernel, y_kernel : numpy.ndarray
+            Phase ramps with shapes (*dx.shape, W // 2 + 1) and (*dy.shape, H), to be used with numpy.fft.rfft2.
+    """
+
+    height, width = shape
+    kx = np.fft.rfftfreq(width)
+    ky = np.fft.fftfreq(height)
+
+    x_kernel = np.exp(-2j * np.pi * dx[..., None] * kx)
+    y_kernel = np.exp(-2j * np.pi * dy[..., None] * ky)
+
+    return x_kernel, y_kernel
+
+def shiftEpochs(stack, mjds, pmx, pmy, reference_mjd=None):
+    """
+    Shift every epoch back along a proper motion track with sub-pixel precision, like the WiseView shift parameter.
+
+    Parameters
+    ----------
+        stack : array_like
+            Epoch cutouts with shape (N, H, W).
+        mjds : array_like
+            MJD of each epoch, with shape (N,).
+        pmx, pmy : float or array_like
+            Proper motion in pixels per year along the x (columns) and y (rows) axes, scalar or shape (M,).
+        reference_mjd : float, optional
+            MJD of the epoch which is left unshifted. Defaults to the first MJD.
+
+    Returns
+    -------
+        shifted_stack : numpy.ndarray
+            Shifted epochs with shape (M, N, H, W).
+
+    Notes
+    -----
+        Shifts are applied in the Fourier domain, so flux leaving one edge of the cutout wraps around to the opposite edge.
+    """
+
+    epoch_stack = asEpochStack(stack)
+    height, width = epoch_stack.shape[1:]
+
+    dx, dy = motionOffsets(mjds, pmx, pmy, reference_mjd)
+    x_kernel, y_kernel = fourierShiftKernels((height, width), -dx, -dy)
+
+    epoch_transforms = np.fft.rfft2(epoch_stack)
+    shifted_transforms = epoch_transforms[None] * y_kernel[..., :, None] * x_kernel[..., None, :]
+
+    return np.fft.irfft2(shifted_transforms, s=(height, width))
+
+def shiftAndStack(stack, mjds, pmx, pmy, reference_mjd=None):
+    """
+    Shift every epoch back along one or more proper motion tracks and average them.
+
+    Parameters
+    ----------
+        stack : array_like
+            Epoch cutouts with shape (N, H, W).
+        mjds : array_like
+            MJD of each epoch, with shape (N,).
+        pmx, pmy : float or array_like
+            Proper motion in pixels per year along the x (columns) and y (rows) axes, scalar or shape (M,).
+        reference_mjd : float, optional
+            MJD to which every epoch is aligned. Defaults to the first MJD.
+
+    Returns
+    -------
+        stacked_images : numpy.ndarray
+            One shift-and-stack image per proper motion hypothesis, with shape (M, H, W).
+
+    Notes
+    -----
+        The sum over epochs is taken in the Fourier domain, so only M inverse transforms are needed no matter how many
+        epochs there are. A source moving with the hypothesized proper motion is concentrated at its reference_mjd
+        position, while sources moving differently are smeared out.
+    """
+
+    epoch_stack = asEpochStack(stack)
+    height, width = epoch_stack.shape[1:]
+
+    dx, dy = motionOffsets(mjds, pmx, pmy, reference_mjd)
+    x_kernel, y_kernel = fourierShiftKernels((height, width), -dx, -dy)
+
+    epoch_transforms = np.fft.rfft2(epoch_stack)
+    stacked_transforms = np.einsum("nyx,mny,mnx->myx", epoch_transforms, y_kernel, x_kernel, optimize=True)
+
+    return np.fft.irfft2(stacked_transforms, s=(height, width)) / epoch_stack.shape[0]
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Single-file flipbook bundles.
+
+A bundle holds the encoded frames of one or more flipbooks together with their metadata, so a campaign writes one file per
+flipbook (or per shard of flipbooks) instead of one file per frame. Any frame can be read back directly as a NumPy array.
+
+File layout:
+    magic (8 bytes) | frame blobs ... | JSON index | index offset (8 bytes) | index length (8 bytes) | magic (8 bytes)
+
+The JSON index maps every flipbook key to its metadata and to the (offset, length) of each of its frames, so random access
+to a frame costs one seek and one read.
+
+Adding flipbooks to an existing bundle appends the new frames, an index of only the new flipbooks and a new trailer after
+the old trailer. Each index also holds the (offset, length) of the index before it, and the chain is merged when the bundle
+is opened, starting from the last trailer of the file. Nothing written before is modified, so an interrupted append leaves
+the previous index readable, and the bundle grows linearly with the number of appends.
+
+@author: Aaron Meisner, Noah Schapera, Austin Humphreys
+"""
+
+import os
+import json
+import mmap
+import struct
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from flipbooks import PostProcessing, FlipbookFrame
+
+class FlipbookBundle:
+
+    magic = b"FLPBNDL1"
+    trailer_format = "<QQ8s"
+    trailer_size = struct.calcsize(trailer_format)
+
+    def __init__(self, filepath, mode="r"):
+        """
+        Open a flipbook bundle.
+
+        Parameters
+        ----------
+            filepath : str
+                Path of the bundle file.
+            mode : str, optional
+                "r" to read, "w" to create (or overwrite) a bundle, or "a" to add flipbooks to an existing bundle,
+                without modifying what it already holds. Defaults to "r".
+        """
+
+        if (mode not in ["r", "w", "a"]):
+            raise ValueError(f"Invalid mode: {mode}. The available modes are: r, w, a.")
+
+        if (mode == "a" and not os.path.exists(filepath)):
+            mode = "w"
+
+        self.filepath = filepath
+        self.mode = mode
+        self.index = {}
+        self.index_location = None
+        self.added_keys = []
+        self.memory_map = None
+
+        if (mode == "w"):
+            self.file = open(filepath, "w+b")
+            self.file.write(self.magic)
+        else:
+            self.file = open(filepath, "rb" if mode == "r" else "r+b")
+            self.readIndex()
+            if (mode == "r"):
+                self.memory_map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def readIndex(self):
+        file_size = self.file.seek(0, os.SEEK_END)
+        if (file_size < len(self.magic) + self.trailer_size):
+            raise ValueError(f"{self.filepath} is not a flipbook bundle.")
+
+        self.file.seek(0)
+        if (self.file.read(len(self.magic)) != self.magic):
+            raise ValueError(f"{self.filepath} is not a flipbook bundle.")
+
+        trailer_end = file_size
+        while (trailer_end >= len(self.magic) + self.trailer_size):
+            self.file.seek(trailer_end - self.trailer_size)
+            index_offset, index_length, trailer_magic = struct.unpack(self.trailer_format, self.file.read(self.trailer_size))
+            if (trailer_magic == self.magic and index_offset + index_length == trailer_end - self.trailer_size):
+                self.index = self.readIndexChain(index_offset, index_length)
+                self.index_location = [index_offset, index_length]
+                if (trailer_end != file_size):
+                    print(f"{self.filepath} has an incomplete append, reading the last complete index.")
+                return index_offset
+
+            # Fall back to the previous trailer, left intact by an interrupted append
+            trailer_end = self.findPreviousTrailerEnd(trailer_end - 1)
+
+        raise ValueError(f"{self.filepath} is not a flipbook bundle.")
+
+    def readIndexChain(self, index_offset, index_length):
+        """
+        Read an index and every index before it, merged into one dictionary of flipbooks in the order they were added.
+        """
+
+        index_records = []
+        index_location = [index_offset, index_length]
+        while (index_location is not None):
+            self.file.seek(index_location[0])
+            index_record = json.loads(self.file.read(index_location[1]).decode("utf-8"))
+            index_records.append(index_record["flipbooks"])
+            index_location = index_record["previous"]
+
+        index = {}
+        for flipbooks in reversed(index_records):
+            index.update(flipbooks)
+        return index
+
+    def findPreviousTrailerEnd(self, end):
+        """
+        Find the end of the last trailer magic starting before end, or -1 if there is none.
+        """
+
+        chunk_size = 1 << 20
+        while (end > len(self.magic)):
+            start = max(end - chunk_size, len(self.magic))
+            self.file.seek(start)
+            position = self.file.read(end - start).rfind(self.magic)
+            if (position >= 0):
+                return start + position + len(self.magic)
+            if (start == len(self.magic)):
+                break
+            # Overlap the chunks so that a magic split between two of them is still found
+            end = start + len(self.magic) - 1
+        return -1
+
+    def close(self):
+        if (self.file.closed):
+            return
+
+        if (self.mode == "w" or len(self.added_keys) > 0):
+            # Only the flipbooks added since opening are indexed, chained to the index which was read
+            index_record = {"previous": self.index_location, "flipbooks": {key: self.index[key] for key in self.added_keys}}
+            index_bytes = json.dumps(index_record, default=str).encode("utf-8")
+            index_offset = self.file.seek(0, os.SEEK_END)
+            self.file.write(index_bytes)
+            self.file.write(struct.pack(self.trailer_format, index_offset, len(index_bytes), self.magic))
+
+        if (self.memory_map is not None):
+            self.memory_map.close()
+            self.memory_map = None
+
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def encodeFrame(frame):
+        """
+        Get the encoded bytes of a frame.
+
+        Parameters
+        ----------
+            frame : bytes, str, PIL.Image.Image or numpy.ndarray
+                Encoded image bytes, file name of an image, or an image to encode as a PNG.
+
+        Returns
+        -------
+            frame_bytes : bytes
+        """
+
+        if (isinstance(frame, (bytes, bytearray, memoryview))):
+            return bytes(frame)
+
+        if (isinstance(frame, str)):
+            with open(frame, "rb") as frame_file:
+                return frame_file.read()
+
+        if (not isinstance(frame, Image.Image)):
+            frame = Image.fromarray(np.asarray(frame))
+
+        buffer = BytesIO()
+        PostProcessing.saveImage(frame, buffer, format="PNG")
+        return buffer.getvalue()
+
+    def addFlipbook(self, key, frames, metadata=None):
+        """
+        Add a flipbook to the bundle.
+
+        Parameters
+        ----------
+            key : str
+                Unique name of the flipbook within the bundle.
+            frames : list
+                Frames in display order, see encodeFrame for the accepted types.
+            metadata : dict, optional
+                JSON serializable metadata of the flipbook, such as the WiseView request metadata.
+        """
+
+        if (self.mode == "r"):
+            raise ValueError("The bundle was opened for reading.")
+
+        if (key in self.index):
+            raise KeyError(f"The flipbook {key} is already in the bundle.")
+
+        self.file.seek(0, os.SEEK_END)
+        frame_entries = []
+        for frame in frames:
+            frame_bytes = self.encodeFrame(frame)
+            frame_entries.append([self.file.tell(), len(frame_bytes)])
+            self.file.write(frame_bytes)
+
+        self.index[key] = {"metadata": metadata if metadata is not None else {}, "frames": frame_entries}
+        self.added_keys.append(key)
+
+    def keys(self):
+        return list(self.index.keys())
+
+    def getMetadata(self, key):
+        return self.index[key]["metadata"]
+
+    def getFrameCount(self, key):
+        return len(self.index[key]["frames"])
+
+    def getFrameBytes(self, key, index):
+        """
+        Get the encoded bytes of one frame.
+
+        Parameters
+        ----------
+            key : str
+                Name of the flipbook.
+            index : int
+                Index of the frame in the flipbook.
+
+        Returns
+        -------
+            frame_bytes : bytes
+                Encoded frame.
+        """
+
+        offset, length = self.index[key]["frames"][index]
+        if (self.memory_map is not None):
+            return self.memory_map[offset:offset + length]
+
+        self.file.seek(offset)
+        return self.file.read(length)
+
+    def getFrame(self, key, index):
+        """
+        Decode one frame into a NumPy array.
+
+        Returns
+        -------
+            frame_data : numpy.ndarray
+                (H, W, C) uint8 array of the frame.
+        """
+
+        return FlipbookFrame.FlipbookFrame(self.getFrameBytes(key, index)).decode()
+
+    def getFrames(self, key, out=None):
+        """
+        Decode every frame of a flipbook into a single (N, H, W, C) array.
+
+        Parameters
+        ----------
+            key : str
+                Name of the flipbook.
+            out : numpy.ndarray, optional
+                Preallocated uint8 array of shape (N, H, W, C) to decode into, which can be reused across flipbooks.
+        """
+
+        frames = [FlipbookFrame.FlipbookFrame(self.getFrameBytes(key, index)) for index in range(self.getFrameCount(key))]
+        return FlipbookFrame.FlipbookFrame.decodeBatch(frames, out=out)
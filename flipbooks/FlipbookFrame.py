@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Lazily decoded flipbook frames.
+
+A FlipbookFrame keeps the PNG bytes received from a response (or read from a bundle) as they are, and only decodes them
+when the pixels are needed. The frame shape is read from the PNG header without decoding, so a batch of frames can be
+decoded into one preallocated (N, H, W, C) array, with each frame written straight into its slot.
+
+@author: Aaron Meisner, Noah Schapera, Austin Humphreys
+"""
+
+import struct
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+class FlipbookFrame:
+
+    png_signature = b"\x89PNG\r\n\x1a\n"
+
+    # Number of channels of the decoded array for each PNG color type, palette frames are decoded as RGB (or RGBA)
+    channel_counts = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+
+    def __init__(self, data):
+        """
+        Wrap the encoded bytes of one PNG frame.
+
+        Parameters
+        ----------
+            data : bytes, bytearray or memoryview
+                Encoded PNG frame. The bytes are referenced, not copied.
+        """
+
+        self.data = data
+        self.buffer = None
+        self.width, self.height, self.bit_depth, self.color_type, self.transparency = self.readHeader(data)
+
+    @classmethod
+    def readHeader(cls, data):
+        """
+        Read the frame size and pixel format from the PNG chunks preceding the image data.
+
+        Returns
+        -------
+            width, height : int
+                Size of the frame in pixels.
+            bit_depth : int
+                Bits per sample.
+            color_type : int
+                PNG color type.
+            transparency : bool
+                True if the frame has a tRNS chunk.
+        """
+
+        data = memoryview(data)
+        if (bytes(data[:8]) != cls.png_signature):
+            raise ValueError("The frame data is not a PNG image.")
+
+        chunk_length, chunk_type = struct.unpack(">I4s", data[8:16])
+        if (chunk_type != b"IHDR"):
+            raise ValueError("The PNG image does not start with an IHDR chunk.")
+        width, height, bit_depth, color_type = struct.unpack(">IIBB", data[16:26])
+
+        # Only the chunk headers are read, up to the first image data chunk
+        transparency = False
+        position = 16 + chunk_length + 4
+        while (position + 8 <= len(data)):
+            chunk_length, chunk_type = struct.unpack(">I4s", data[position:position + 8])
+            if (chunk_type in (b"IDAT", b"IEND")):
+                break
+            if (chunk_type == b"tRNS"):
+                transparency = True
+            position += 8 + chunk_length + 4
+
+        return width, height, bit_depth, color_type, transparency
+
+    @property
+    def shape(self):
+        """
+        Shape of the decoded frame, (H, W, C), known without decoding.
+        """
+
+        channels = self.channel_counts[self.color_type]
+        if (self.color_type == 3 and self.transparency):
+            channels = 4
+        return (self.height, self.width, channels)
+
+    @property
+    def mode(self):
+        """
+        PIL mode of the decoded frame.
+        """
+
+        return {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}[self.shape[-1]]
+
+    def decode(self, out=None):
+        """
+        Decode the frame.
+
+        Parameters
+        ----------
+            out : numpy.ndarray, optional
+                uint8 array of the frame shape to decode into, such as one slot of a batch array. By default, the frame
+                decodes into its own buffer, which is allocated once and reused by later calls.
+
+        Returns
+        -------
+            frame_data : numpy.ndarray
+                (H, W, C) uint8 array of the frame.
+        """
+
+        if (out is None):
+            if (self.buffer is not None):
+                return self.buffer
+            self.buffer = np.empty(self.shape, dtype=np.uint8)
+            out = self.buffer
+
+        if (out.shape != self.shape):
+            raise ValueError(f"The output array must have shape {self.shape}, not {out.shape}.")
+
+        with Image.open(BytesIO(self.data)) as image:
+            if (image.mode != self.mode):
+                image = image.convert(self.mode)
+            out.reshape(self.height, self.width, -1)[...] = np.asarray(image).reshape(self.height, self.width, -1)
+
+        return out
+
+    def release(self):
+        """
+        Drop the decoded buffer, keeping only the encoded bytes.
+        """
+
+        self.buffer = None
+
+    @classmethod
+    def decodeBatch(cls, frames, out=None):
+        """
+        Decode a batch of frames of the same shape into a single (N, H, W, C) array.
+
+        Parameters
+        ----------
+            frames : list
+                FlipbookFrame objects, or encoded PNG bytes.
+            out : numpy.ndarray, optional
+                Preallocated uint8 array of shape (N, H, W, C), which can be reused across batches. Allocated if not given.
+
+        Returns
+        -------
+            frames_data : numpy.ndarray
+                (N, H, W, C) uint8 array of the frames.
+        """
+
+        frames = [frame if isinstance(frame, FlipbookFrame) else cls(frame) for frame in frames]
+        if (len(frames) == 0):
+            raise ValueError("At least one frame is needed to decode a batch.")
+
+        shape = frames[0].shape
+        for frame in frames:
+            if (frame.shape != shape):
+                raise ValueError(f"All frames of a batch must have the same shape, found {shape} and {frame.shape}.")
+
+        if (out is None):
+            out = np.empty((len(frames), *shape), dtype=np.uint8)
+        elif (out.shape != (len(frames), *shape) or out.dtype != np.uint8):
+            raise ValueError(f"The output array must be a uint8 array of shape {(len(frames), *shape)}.")
+
+        for index, frame in enumerate(frames):
+            frame.decode(out=out[index])
+
+        return out
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+Animated and sprite sheet flipbook writers.
+
+Flipbook frames share almost all of their colors, so instead of quantizing every frame independently, the GIF writer
+builds one palette per flipbook from a sample of frames and maps every frame onto it with a cached color lookup.
+
+@author: Aaron Meisner, Noah Schapera, Austin Humphreys
+"""
+
+import os
+import json
+
+import numpy as np
+from PIL import Image
+
+from flipbooks import PostProcessing
+
+def loadFrame(frame):
+    """
+    Load one frame as an (H, W, 3) uint8 RGB array, at the display scale recorded in its metadata.
+
+    Parameters
+    ----------
+        frame : str, PIL.Image.Image or numpy.ndarray
+            File name, image or array of the frame.
+
+    Returns
+    -------
+        frame_data : numpy.ndarray
+            RGB array of the frame.
+    """
+
+    if (isinstance(frame, str)):
+        with Image.open(frame) as image:
+            return loadFrame(image)
+
+    if (isinstance(frame, Image.Image)):
+        # Apply a scale factor recorded as metadata instead of materialized (see PostProcessing.recordScaleFactor)
+        scale_factor = PostProcessing.getScaleFactor(frame)
+        if (frame.mode != "RGB"):
+            frame = frame.convert("RGB")
+        if (scale_factor != 1 and scale_factor == int(scale_factor)):
+            return PostProcessing.upscaleArray(np.asarray(frame), int(scale_factor))
+        elif (scale_factor != 1):
+            frame = frame.resize((int(frame.width * scale_factor), int(frame.height * scale_factor)), Image.Resampling.NEAREST)
+        return np.asarray(frame)
+
+    frame_data = np.asarray(frame)
+    if (frame_data.ndim == 2):
+        frame_data = np.repeat(frame_data[..., None], 3, axis=-1)
+    elif (frame_data.shape[-1] == 4):
+        frame_data = frame_data[..., :3]
+
+    return frame_data.astype(np.uint8, copy=False)
+
+def packColors(frame_data):
+    """
+    Pack RGB triplets into single 24 bit integer keys.
+    """
+
+    return (frame_data[..., 0].astype(np.uint32) << 16) | (frame_data[..., 1].astype(np.uint32) << 8) | frame_data[..., 2]
+
+def unpackColors(color_keys):
+    """
+    Unpack 24 bit integer keys into an (..., 3) uint8 RGB array.
+    """
+
+    return np.stack(((color_keys >> 16) & 255, (color_keys >> 8) & 255, color_keys & 255), axis=-1).astype(np.uint8)
+
+class GlobalPalette:
+    """
+    A palette shared by every frame of a flipbook, with a cached lookup from colors to palette indices.
+
+    Parameters
+    ----------
+        sample_frames : list of numpy.ndarray
+            RGB frames from which the palette is built.
+        colors : int, optional
+            Maximum number of palette colors. Defaults to 256.
+
+    Notes
+    -----
+        If the sample has at most `colors` distinct colors, the palette is exact. Otherwise the sample is quantized with
+        median cut, and colors missing from the palette are mapped onto their nearest palette color. Every color is only
+        matched once, later frames reuse the cached matches.
+    """
+
+    def __init__(self, sample_frames, colors=256):
+        sample_keys = np.unique(np.concatenate([packColors(frame).ravel() for frame in sample_frames]))
+
+        if (len(sample_keys) <= colors):
+            palette_keys = sample_keys
+        else:
+            mosaic = Image.fromarray(np.concatenate(sample_frames, axis=0))
+            quantized_mosaic = mosaic.quantize(colors, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+            used_colors = np.array(quantized_mosaic.getpalette()[:3 * colors], dtype=np.uint32).reshape(-1, 3)
+            palette_keys = np.unique(packColors(used_colors))
+
+        self.palette = unpackColors(palette_keys)
+        self.known_keys = palette_keys
+        self.known_indices = np.arange(len(palette_keys), dtype=np.uint8)
+
+    def nearestIndices(self, color_keys, chunk_size=4096):
+        colors = unpackColors(color_keys).astype(np.int32)
+        palette = self.palette.astype(np.int32)
+        nearest_indices = np.empty(len(colors), dtype=np.uint8)
+        for start in range(0, len(colors), chunk_size):
+            differences = colors[start:start + chunk_size, None, :] - palette[None, :, :]
+            nearest_indices[start:start + chunk_size] = np.argmin((differences ** 2).sum(axis=-1), axis=1)
+        return nearest_indices
+
+    def mapFrame(self, frame_data):
+        """
+        Map an RGB frame onto the palette.
+
+        Parameters
+        ----------
+            frame_data : numpy.ndarray
+                (H, W, 3) uint8 RGB frame.
+
+        Returns
+        -------
+            image : PIL.Image.Image
+                "P" mode image using this palette.
+        """
+
+        color_keys = packColors(frame_data)
+        positions = np.searchsorted(self.known_keys, color_keys)
+        positions = np.minimum(positions, len(self.known_keys) - 1)
+        hits = self.known_keys[positions] == color_keys
+
+        if (not hits.all()):
+            missing_keys = np.unique(color_keys[~hits])
+            missing_indices = self.nearestIndices(missing_keys)
+
+            merged_keys = np.concatenate((self.known_keys, missing_keys))
+            merged_indices = np.concatenate((self.known_indices, missing_indices))
+            order = np.argsort(merged_keys, kind="stable")
+            self.known_keys = merged_keys[order]
+            self.known_indices = merged_indices[order]
+
+            positions = np.searchsorted(self.known_keys, color_keys)
+
+        image = Image.fromarray(self.known_indices[positions])
+        image.putpalette(self.palette.ravel().tolist())
+        return image
+
+def sampleFrames(frames, sample_size):
+    """
+    Pick up to sample_size frames spread evenly over the flipbook.
+    """
+
+    sample_indices = np.unique(np.linspace(0, len(frames) - 1, min(sample_size, len(frames))).round().astype(int))
+    return [loadFrame(frames[i]) for i in sample_indices]
+
+def writeGIF(frames, gif_filepath, duration=0.2, loop=0, sample_size=8):
+    """
+    Write a GIF animation using a single palette shared by every frame.
+
+    Parameters
+    ----------
+        frames : list
+            Frames as file names, PIL images or RGB arrays, in display order.
+        gif_filepath : str
+            Output path filename for the GIF animation.
+        duration : float, optional
+            Time interval in seconds for each frame.
+        loop : int, optional
+            Number of times the animation loops, 0 loops forever. Defaults to 0.
+        sample_size : int, optional
+            Number of frames, spread evenly over the flipbook, used to build the palette. Defaults to 8.
+
+    Returns
+    -------
+        gif_filepath : str
+            Output path filename of the GIF animation.
+
+    Notes
+    -----
+        Frames are decoded and mapped onto the palette one at a time as the encoder consumes them.
+    """
+
+    if (len(frames) == 0):
+        raise ValueError("At least one frame is needed to create a GIF.")
+
+    global_palette = GlobalPalette(sampleFrames(frames, sample_size))
+    palette_frames = (global_palette.mapFrame(loadFrame(frame)) for frame in frames)
+
+    first_frame = next(palette_frames)
+    first_frame.save(gif_filepath, save_all=True, append_images=palette_frames, duration=int(duration * 1000), loop=loop, optimize=False)
+
+    return gif_filepath
+
+# File extension of each animated output format
+animation_extensions = {
+    "gif": ".gif",
+    "apng": ".png",
+    "webp": ".webp",
+    "webp-lossy": ".webp",
+}
+
+def writeAnimation(frames, filepath, duration=0.2, output_format="gif", loop=0, quality=80):
+    """
+    Write an animation in one of the supported output formats.
+
+    Parameters
+    ----------
+        frames : list
+            Frames as file names, PIL images or RGB arrays, in display order.
+        filepath : str
+            Output path filename for the animation. The format is given by output_format, not the file extension.
+        duration : float, optional
+            Time interval in seconds for each frame.
+        output_format : str, optional
+            "gif" (global palette GIF, see writeGIF), "apng" (animated PNG), "webp" (lossless animated WebP) or
+            "webp-lossy" (lossy animated WebP). Defaults to "gif".
+        loop : int, optional
+            Number of times the animation loops, 0 loops forever. Defaults to 0.
+        quality : int, optional
+            Quality in the range [0, 100] of lossy WebP frames, or the compression effort of lossless ones. Defaults to 80.
+
+    Returns
+    -------
+        filepath : str
+            Output path filename of the animation.
+    """
+
+    if (output_format not in animation_extensions):
+        raise ValueError(f"Invalid output format: {output_format}. The available formats are: {list(animation_extensions.keys())}.")
+
+    if (len(frames) == 0):
+        raise ValueError("At least one frame is needed to create an animation.")
+
+    if (output_format == "gif"):
+        return writeGIF(frames, filepath, duration=duration, loop=loop)
+
+    # The APNG and WebP writers need the appended frames as a list
+    rgb_frames = [Image.fromarray(loadFrame(frame)) for frame in frames]
+    first_frame = rgb_frames[0]
+    save_kwargs = {"save_all": True, "append_images": rgb_frames[1:], "duration": int(duration * 1000), "loop": loop}
+
+    if (output_format == "apng"):
+        first_frame.save(filepath, format="PNG", **save_kwargs)
+    else:
+        first_frame.save(filepath, format="WEBP", lossless=(output_format == "webp"), quality=quality, **save_kwargs)
+
+    return filepath
+
+def writeSpriteSheet(frames, sheet_filepath, columns=None, mjds=None, labels=None, metadata=None):
+    """
+    Pack every frame of a flipbook into one tiled sprite sheet image, with a JSON sidecar describing the tiles.
+
+    Parameters
+    ----------
+        frames : list
+            Frames as file names, PIL images or RGB arrays, in display order. All frames must have the same size.
+        sheet_filepath : str
+            Output path filename of the sprite sheet image. The sidecar is written next to it with a .json extension.
+        columns : int, optional
+            Number of frames per row. Defaults to a roughly square sheet.
+        mjds : list, optional
+            MJD of each frame, stored in the sidecar.
+        labels : list, optional
+            Label of each frame (such as its layer), stored in the sidecar.
+        metadata : dict, optional
+            JSON serializable metadata of the flipbook, stored in the sidecar.
+
+    Returns
+    -------
+        sheet_filepath : str
+            Output path filename of the sprite sheet image.
+        sidecar_filepath : str
+            Output path filename of the JSON sidecar.
+
+    Notes
+    -----
+        The sidecar holds the frame width and height, the number of columns and rows, and for every frame its index, the
+        (x, y) pixel offset of its tile and its MJD and label when given.
+    """
+
+    frame_count = len(frames)
+    if (frame_count == 0):
+        raise ValueError("At least one frame is needed to create a sprite sheet.")
+
+    if (columns is None):
+        columns = int(np.ceil(np.sqrt(frame_count)))
+    rows = int(np.ceil(frame_count / columns))
+
+    sheet_data = None
+    frame_entries = []
+    for index, frame in enumerate(frames):
+        frame_data = loadFrame(frame)
+        if (sheet_data is None):
+            frame_height, frame_width = frame_data.shape[:2]
+            sheet_data = np.full((rows * frame_height, columns * frame_width, 3), 255, dtype=np.uint8)
+        elif (frame_data.shape[:2] != (frame_height, frame_width)):
+            raise ValueError("All frames of a sprite sheet must have the same size.")
+
+        x = (index % columns) * frame_width
+        y = (index // columns) * frame_height
+        sheet_data[y:y + frame_height, x:x + frame_width] = frame_data
+
+        frame_entry = {"index": index, "x": x, "y": y}
+        if (mjds is not None):
+            frame_entry["mjd"] = mjds[index]
+        if (labels is not None):
+            frame_entry["label"] = labels[index]
+        frame_entries.append(frame_entry)
+
+    PostProcessing.saveImage(Image.fromarray(sheet_data), sheet_filepath)
+
+    sidecar = {
+        "image": os.path.basename(sheet_filepath),
+        "frame_width": frame_width,
+        "frame_height": frame_height,
+        "columns": columns,
+        "rows": rows,
+        "frame_count": frame_count,
+        "frames": frame_entries,
+        "metadata": metadata if metadata is not None else {},
+    }
+
+    sidecar_filepath = os.path.splitext(sheet_filepath)[0] + ".json"
+    with open(sidecar_filepath, "w") as sidecar_file:
+        json.dump(sidecar, sidecar_file, indent=1, default=str)
+
+    return sheet_filepath, sidecar_filepath
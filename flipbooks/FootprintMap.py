@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Survey footprint maps learned from observed responses.
+
+Every data / no data response of a layer is accumulated into two HEALPix bitmaps, the cells where data was seen and the
+cells where it was missing. Catalogs can then be pre-filtered with one vectorized lookup, dropping the targets in cells
+which were only ever seen empty before queuing any request.
+
+@author: Aaron Meisner, Noah Schapera, Austin Humphreys
+"""
+
+import threading
+
+import numpy as np
+
+from flipbooks import HEALPix
+
+class FootprintMap:
+
+    def __init__(self, order=8):
+        """
+        Create an empty footprint map.
+
+        Parameters
+        ----------
+            order : int, optional
+                HEALPix order of the bitmap cells, about 14 arcminutes across at the default of 8. Each bitmap takes
+                12 * 4 ** order bits, 96 KiB per layer at order 8.
+        """
+
+        self.order = order
+        self.bitmap_size = (HEALPix.pixelCount(order) + 7) // 8
+        self.covered_bitmaps = {}
+        self.empty_bitmaps = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, filepath):
+        """
+        Load a footprint map saved with save.
+        """
+
+        with np.load(filepath, allow_pickle=False) as data:
+            footprint_map = cls(int(data["order"]))
+            for index, layer in enumerate(data["layers"]):
+                footprint_map.covered_bitmaps[str(layer)] = data["covered"][index].copy()
+                footprint_map.empty_bitmaps[str(layer)] = data["empty"][index].copy()
+        return footprint_map
+
+    def save(self, filepath):
+        """
+        Save the footprint map with numpy.savez_compressed.
+        """
+
+        with self.lock:
+            layers = self.getLayers()
+            empty_bitmap_stack = np.zeros((0, self.bitmap_size), dtype=np.uint8)
+            np.savez_compressed(
+                filepath,
+                order=self.order,
+                layers=np.array(layers, dtype=str),
+                covered=np.stack([self.covered_bitmaps[layer] for layer in layers]) if len(layers) > 0 else empty_bitmap_stack,
+                empty=np.stack([self.empty_bitmaps[layer] for layer in layers]) if len(layers) > 0 else empty_bitmap_stack,
+            )
+
+    def getLayers(self):
+        return sorted(self.covered_bitmaps.keys())
+
+    def getCells(self, ra, dec):
+        return np.atleast_1d(HEALPix.ang2pixNested(self.order, ra, dec))
+
+    @staticmethod
+    def getBits(bitmap, cells):
+        return ((bitmap[cells >> 3] >> (7 - (cells & 7)).astype(np.uint8)) & 1).astype(bool)
+
+    @staticmethod
+    def setBits(bitmap, cells):
+        np.bitwise_or.at(bitmap, cells >> 3, (np.uint8(1) << (7 - (cells & 7)).astype(np.uint8)))
+
+    def addObservations(self, layer, ra, dec, has_data):
+        """
+        Accumulate observed responses of a layer.
+
+        Parameters
+        ----------
+            layer : str
+                Layer (or survey version) identifier.
+            ra, dec : float or array_like
+                Sky coordinates in degrees.
+            has_data : bool or array_like
+                Whether the layer had data at each position.
+        """
+
+        cells = self.getCells(ra, dec)
+        has_data = np.broadcast_to(np.asarray(has_data, dtype=bool), cells.shape)
+
+        with self.lock:
+            if (layer not in self.covered_bitmaps):
+                self.covered_bitmaps[layer] = np.zeros(self.bitmap_size, dtype=np.uint8)
+                self.empty_bitmaps[layer] = np.zeros(self.bitmap_size, dtype=np.uint8)
+
+            self.setBits(self.covered_bitmaps[layer], cells[has_data])
+            self.setBits(self.empty_bitmaps[layer], cells[~has_data])
+
+    def covers(self, ra, dec, layer, include_unobserved=True):
+        """
+        Check whether a layer covers sky positions.
+
+        Parameters
+        ----------
+            ra, dec : float or array_like
+                Sky coordinates in degrees.
+            layer : str
+                Layer (or survey version) identifier.
+            include_unobserved : bool, optional
+                Whether positions in cells without any observation count as covered. Defaults to True, so only the
+                targets in cells which were seen empty, and never seen with data, are dropped.
+
+        Returns
+        -------
+            covered : numpy.ndarray
+                Boolean array, broadcast from ra and dec.
+        """
+
+        cells = self.getCells(ra, dec)
+
+        if (layer not in self.covered_bitmaps):
+            return np.full(cells.shape, include_unobserved)
+
+        covered = self.getBits(self.covered_bitmaps[layer], cells)
+        if (include_unobserved):
+            covered |= ~self.getBits(self.empty_bitmaps[layer], cells)
+
+        return covered
+
+    def getCoveredFraction(self, layer):
+        """
+        Fraction of the sky in cells where the layer was seen with data.
+        """
+
+        if (layer not in self.covered_bitmaps):
+            return 0.0
+        return np.unpackbits(self.covered_bitmaps[layer]).sum() / HEALPix.pixelCount(self.order)
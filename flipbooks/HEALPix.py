@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal NumPy implementation of the HEALPix nested pixelization.
+
+Only the sky position to pixel index mapping is implemented, vectorized over arrays of positions, which is all that is
+needed to key caches and footprint maps by sky cell without depending on healpy.
+
+@author: Aaron Meisner, Noah Schapera, Austin Humphreys
+"""
+
+import numpy as np
+
+max_order = 29
+
+def orderToNside(order):
+    """
+    Number of pixels along the side of each base pixel, 2 ** order.
+    """
+
+    if (order < 0 or order > max_order):
+        raise ValueError(f"The HEALPix order must be in the range [0, {max_order}].")
+
+    return 1 << order
+
+def pixelCount(order):
+    """
+    Number of pixels covering the sky at a HEALPix order, 12 * nside ** 2.
+    """
+
+    return 12 * orderToNside(order) ** 2
+
+def pixelSize(order):
+    """
+    Approximate side length of the pixels at a HEALPix order, in arcseconds.
+    """
+
+    return np.degrees(np.sqrt(4 * np.pi / pixelCount(order))) * 3600
+
+def spreadBits(values):
+    """
+    Spread the bits of integers onto the even bit positions, to interleave them into a nested index.
+    """
+
+    values = values.astype(np.uint64)
+    values = (values | (values << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    values = (values | (values << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    values = (values | (values << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    values = (values | (values << np.uint64(2))) & np.uint64(0x3333333333333333)
+    values = (values | (values << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return values
+
+def ang2pixNested(order, ra, dec):
+    """
+    Nested HEALPix pixel indices of sky positions.
+
+    Parameters
+    ----------
+        order : int
+            HEALPix order, the resolution is nside = 2 ** order.
+        ra, dec : float or array_like
+            Sky coordinates in degrees.
+
+    Returns
+    -------
+        pixels : numpy.ndarray
+            int64 nested pixel index of each position, broadcast from ra and dec.
+    """
+
+    nside = orderToNside(order)
+
+    ra, dec = np.broadcast_arrays(np.asarray(ra, dtype=np.float64), np.asarray(dec, dtype=np.float64))
+    z = np.sin(np.radians(dec))
+    za = np.abs(z)
+    tt = np.mod(np.radians(ra), 2 * np.pi) * (2 / np.pi)
+    tt = np.where(tt >= 4, 0, tt)
+
+    face = np.empty(z.shape, dtype=np.int64)
+    ix = np.empty(z.shape, dtype=np.int64)
+    iy = np.empty(z.shape, dtype=np.int64)
+
+    # Equatorial region
+    equatorial = za <= 2 / 3
+    temp1 = nside * (0.5 + tt[equatorial])
+    temp2 = nside * (0.75 * z[equatorial])
+    jp = (temp1 - temp2).astype(np.int64)
+    jm = (temp1 + temp2).astype(np.int64)
+    ifp = jp // nside
+    ifm = jm // nside
+    face[equatorial] = np.where(ifp == ifm, ifp | 4, np.where(ifp < ifm, ifp, ifm + 8))
+    ix[equatorial] = jm & (nside - 1)
+    iy[equatorial] = nside - (jp & (nside - 1)) - 1
+
+    # Polar caps
+    polar = ~equatorial
+    ntt = np.minimum(tt[polar].astype(np.int64), 3)
+    tp = tt[polar] - ntt
+    tmp = nside * np.sqrt(3 * (1 - za[polar]))
+    jp = np.minimum((tp * tmp).astype(np.int64), nside - 1)
+    jm = np.minimum(((1 - tp) * tmp).astype(np.int64), nside - 1)
+    north = z[polar] >= 0
+    face[polar] = np.where(north, ntt, ntt + 8)
+    ix[polar] = np.where(north, nside - jm - 1, jp)
+    iy[polar] = np.where(north, nside - jp - 1, jm)
+
+    nested_index = spreadBits(ix) | (spreadBits(iy) << np.uint64(1))
+    return face * (nside * nside) + nested_index.astype(np.int64)
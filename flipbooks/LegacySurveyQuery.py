@@ -1,22 +1,320 @@
 import os
+import threading
+import collections
+import urllib.parse
 from io import BytesIO
+from types import MappingProxyType
+
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+import requests.adapters
 from astropy.io import fits
 from PIL import Image
 import numpy as np
 
-from flipbooks import PostProcessing
-
+from flipbooks import PostProcessing, FlipbookWriter, ColorComposition
+
+# Validation tables of the Legacy Survey viewer parameters, built once at import and read-only
+special_dict_params = MappingProxyType({
+    "decamfoot": ("ra", "dec"),
+    "desifoot": ("ra", "dec"),
+    "desifiber": ("ra", "dec"),
+})
+
+valid_layers = MappingProxyType({
+    "ls-dr10": None,
+    "ls-dr10-model": None,
+    "ls-dr10-resid": None,
+    "ls-dr10-south": None,
+    "ls-dr10-south-model": None,
+    "ls-dr10-south-resid": None,
+    "ls-dr10-grz": None,
+    "ls-dr10-model-grz": None,
+    "ls-dr10-resid-grz": None,
+    "ls-dr10-south-grz": None,
+    "ls-dr10-south-model-grz": None,
+    "ls-dr10-south-resid-grz": None,
+    "ls-dr9": None,
+    "ls-dr9-model": None,
+    "ls-dr9-resid": None,
+    "ls-dr9.1.1": None,
+    "ls-dr9.1.1-model": None,
+    "ls-dr9.1.1-resid": None,
+    "ls-dr9-north": None,
+    "ls-dr9-north-model": None,
+    "ls-dr9-north-resid": None,
+    "ls-dr9-south": None,
+    "ls-dr9-south-model": None,
+    "ls-dr9-south-resid": None,
+    "ls-dr8": None,
+    "ls-dr8-model": None,
+    "ls-dr8-resid": None,
+    "ls-dr8-north": None,
+    "ls-dr8-north-model": None,
+    "ls-dr8-north-resid": None,
+    "ls-dr8-south": None,
+    "ls-dr8-south-model": None,
+    "ls-dr8-south-resid": None,
+    "ls-dr67": None,
+    "decals-dr7": None,
+    "decals-dr7-model": None,
+    "decals-dr7-resid": None,
+    "mzls+bass-dr6": None,
+    "mzls+bass-dr6-model": None,
+    "mzls+bass-dr6-resid": None,
+    "decals-dr5": None,
+    "decals-dr5-model": None,
+    "decals-dr5-resid": None,
+    "unwise-neo7": None,
+    "unwise-neo6": None,
+    "unwise-neo4": None,
+    "unwise-cat-model": None,
+    "wssa": None,
+    "des-dr1": None,
+    "decaps2": None,
+    "decaps2-model": None,
+    "decaps2-resid": None,
+    "decaps2-riy": None,
+    "decaps2-model-riy": None,
+    "decaps2-resid-riy": None,
+    "galex": None,
+    "halpha": None,
+    "hsc-dr2": None,
+    "hsc-dr3": None,
+    "sdss": None,
+    "sfd": None,
+    "vlass1.2": None,
+})
+
+valid_overlays = MappingProxyType({
+    "decamfoot": None,
+    "bricks": None,
+    "ccds10": None,
+    "exps10": None,
+    "ccds9": None,
+    "ccds9n": None,
+    "ccds9s": None,
+    "exps9": None,
+    "masks-dr9": None,
+    "ccds8": None,
+    "ccds8n": None,
+    "ccds8s": None,
+    "exps8": None,
+    "ccds7": None,
+    "exps7": None,
+    "exps5": None,
+    "ccds6": None,
+    "ccds5": None,
+    "ccdssdss": None,
+    "unwise_tile": None,
+    "sources-dr10": None,
+    "sources-dr10-south": None,
+    "sources-dr9": None,
+    "sources-dr9n": None,
+    "sources-dr9s": None,
+    "sources-dr8": None,
+    "sources-dr8n": None,
+    "sources-dr8s": None,
+    "sources-dr7": None,
+    "sources-dr6": None,
+    "sources-dr5": None,
+    "gaia-dr2": None,
+    "gaia-edr3": None,
+    "hsc-dr2-cosmos": None,
+    "sdss-cat": None,
+    "manga": None,
+    "spectra": None,
+    "sdss-plates": None,
+    "spectra-deep2": None,
+    "desifoot": (None, None),
+    "desifiber": (None, None),
+    "desi-tiles-edr": None,
+    "desi-spec-edr": None,
+    "targets-dr9-main-dark": None,
+    "targets-dr9-main-bright": None,
+    "targets-dr9-main-sec-dark": None,
+    "targets-dr9-main-sec-bright": None,
+    "targets-dr9-sv3-dark": None,
+    "targets-dr9-sv3-bright": None,
+    "targets-dr9-sv3-sec-dark": None,
+    "targets-dr9-sv3-sec-bright": None,
+    "targets-dr9-sv1-dark": None,
+    "targets-dr9-sv1-bright": None,
+    "targets-dr9-sv1-sec-dark": None,
+    "targets-dr9-sv1-sec-bright": None,
+    "bright": None,
+    "tycho2": None,
+    "GCs-PNe": None,
+    "ngc": None,
+    "sga": None,
+    "sga-parent": None,
+    "photoz-dr9": None,
+    "const": None
+})
+
+layer_dictionary = MappingProxyType({
+    "Legacy Surveys DR10 images": "ls-dr10",
+    "Legacy Surveys DR10 models": "ls-dr10-model",
+    "Legacy Surveys DR10 residuals": "ls-dr10-resid",
+    "Legacy Surveys DR10-south images": "ls-dr10-south",
+    "Legacy Surveys DR10-south models": "ls-dr10-south-model",
+    "Legacy Surveys DR10-south residuals": "ls-dr10-south-resid",
+    "Legacy Surveys DR10 images (grz)": "ls-dr10-grz",
+    "Legacy Surveys DR10 models (grz)": "ls-dr10-model-grz",
+    "Legacy Surveys DR10 residuals (grz)": "ls-dr10-resid-grz",
+    "Legacy Surveys DR10-south images (grz)": "ls-dr10-south-grz",
+    "Legacy Surveys DR10-south models (grz)": "ls-dr10-south-model-grz",
+    "Legacy Surveys DR10-south residuals (grz)": "ls-dr10-south-resid-grz",
+    "Legacy Surveys DR9 images": "ls-dr9",
+    "Legacy Surveys DR9 models": "ls-dr9-model",
+    "Legacy Surveys DR9 residuals": "ls-dr9-resid",
+    "Legacy Surveys DR9.1.1 COSMOS deep images": "ls-dr9.1.1",
+    "Legacy Surveys DR9.1.1 COSMOS deep models": "ls-dr9.1.1-model",
+    "Legacy Surveys DR9.1.1 COSMOS deep residuals": "ls-dr9.1.1-resid",
+    "Legacy Surveys DR9-north images": "ls-dr9-north",
+    "Legacy Surveys DR9-north models": "ls-dr9-north-model",
+    "Legacy Surveys DR9-north residuals": "ls-dr9-north-resid",
+    "Legacy Surveys DR9-south images": "ls-dr9-south",
+    "Legacy Surveys DR9-south models": "ls-dr9-south-model",
+    "Legacy Surveys DR9-south residuals": "ls-dr9-south-resid",
+    "Legacy Surveys DR8 images": "ls-dr8",
+    "Legacy Surveys DR8 models": "ls-dr8-model",
+    "Legacy Surveys DR8 residuals": "ls-dr8-resid",
+    "Legacy Surveys DR8-north images": "ls-dr8-north",
+    "Legacy Surveys DR8-north models": "ls-dr8-north-model",
+    "Legacy Surveys DR8-north residuals": "ls-dr8-north-resid",
+    "Legacy Surveys DR8-south images": "ls-dr8-south",
+    "Legacy Surveys DR8-south models": "ls-dr8-south-model",
+    "Legacy Surveys DR8-south residuals": "ls-dr8-south-resid",
+    "Legacy Surveys DR6+DR7": "ls-dr67",
+    "DECaLS DR7 images": "decals-dr7",
+    "DECaLS DR7 models": "decals-dr7-model",
+    "DECaLS DR7 residuals": "decals-dr7-resid",
+    "MzLS+BASS DR6 images": "mzls+bass-dr6",
+    "MzLS+BASS DR6 models": "mzls+bass-dr6-model",
+    "MzLS+BASS DR6 residuals": "mzls+bass-dr6-resid",
+    "DECaLS DR5 images": "decals-dr5",
+    "DECaLS DR5 models": "decals-dr5-model",
+    "DECaLS DR5 residuals": "decals-dr5-resid",
+    "unWISE W1/W2 NEO7": "unwise-neo7",
+    "unWISE W1/W2 NEO6": "unwise-neo6",
+    "unWISE W1/W2 NEO4": "unwise-neo4",
+    "unWISE Catalog model": "unwise-cat-model",
+    "WISE 12-micron dust map": "wssa",
+    "DES DR1": "des-dr1",
+    "DECaPS2 images": "decaps2",
+    "DECaPS2 models": "decaps2-model",
+    "DECaPS2 residuals": "decaps2-resid",
+    "DECaPS2 images (riY)": "decaps2-riy",
+    "DECaPS2 models (riY)": "decaps2-model-riy",
+    "DECaPS2 residuals (riY)": "decaps2-resid-riy",
+    "GALEX": "galex",
+    "Halpha maps": "halpha",
+    "HSC DR2": "hsc-dr2",
+    "HSC DR3": "hsc-dr3",
+    "SDSS": "sdss",
+    "SFD Dust": "sfd",
+    "VLASS 1.2": "vlass1.2",
+})
+
+overlay_dictionary = MappingProxyType({
+    "DECam Footprint": "decamfoot",
+    "Legacy Surveys Bricks": "bricks",
+    "Legacy Surveys DR10 CCDs": "ccds10",
+    "Legacy Surveys DR10 Exposures": "exps10",
+    "Legacy Surveys DR9 CCDs": "ccds9",
+    "Legacy Surveys DR9-north CCDs": "ccds9n",
+    "Legacy Surveys DR9-south CCDs": "ccds9s",
+    "Legacy Surveys DR9-south Exposures": "exps9",
+    "All masks (LS-DR9)": "masks-dr9",
+    "Legacy Surveys DR8 CCDs": "ccds8",
+    "Legacy Surveys DR8-north CCDs": "ccds8n",
+    "Legacy Surveys DR8-south CCDs": "ccds8s",
+    "Legacy Surveys DR8-south Exposures": "exps8",
+    "DECaLS DR7 CCDs": "ccds7",
+    "DECaLS DR7 Exposures": "exps7",
+    "DECaLS DR5 Exposures": "exps5",
+    "MzLS+BASS DR6 CCDs": "ccds6",
+    "DECaLS DR5 CCDs": "ccds5",
+    "SDSS CCDs": "ccdssdss",
+    "unWISE tiles": "unwise_tile",
+    "Legacy Surveys DR10 Catalog": "sources-dr10",
+    "Legacy Surveys DR10-south Catalog": "sources-dr10-south",
+    "Legacy Surveys DR9 Catalog": "sources-dr9",
+    "Legacy Surveys DR9-north Catalog": "sources-dr9n",
+    "Legacy Surveys DR9-south Catalog": "sources-dr9s",
+    "Legacy Surveys DR8 Catalog": "sources-dr8",
+    "Legacy Surveys DR8-north Catalog": "sources-dr8n",
+    "Legacy Surveys DR8-south Catalog": "sources-dr8s",
+    "DECaLS DR7 catalog": "sources-dr7",
+    "MzLS+BASS DR6 Catalog": "sources-dr6",
+    "DECaLS DR5 Catalog": "sources-dr5",
+    "Gaia DR2 catalog": "gaia-dr2",
+    "Gaia EDR3 catalog": "gaia-edr3",
+    "HSC DR2 COSMOS catalog": "hsc-dr2-cosmos",
+    "SDSS catalog": "sdss-cat",
+    "MaNGa IFU Spectra": "manga",
+    "SDSS Spectra (DR16)": "spectra",
+    "SDSS Spectro Plates": "sdss-plates",
+    "DEEP2 Spectra": "spectra-deep2",
+    "DESI Footprint": "desifoot",
+    "DESI Fibers": "desifiber",
+    "DESI EDR tiles": "desi-tiles-edr",
+    "DESI EDR spectra": "desi-spec-edr",
+    "DESI Dark-time Targets (DR9/Main)": "targets-dr9-main-dark",
+    "DESI Bright-time Targets (DR9/Main)": "targets-dr9-main-bright",
+    "DESI Dark-time Secondary Targets (DR9/Main)": "targets-dr9-main-sec-dark",
+    "DESI Bright-time Secondary Targets (DR9/Main)": "targets-dr9-main-sec-bright",
+    "DESI Dark-time Targets (DR9/SV3)": "targets-dr9-sv3-dark",
+    "DESI Bright-time Targets (DR9/SV3)": "targets-dr9-sv3-bright",
+    "DESI Dark-time Secondary Targets (DR9/SV3)": "targets-dr9-sv3-sec-dark",
+    "DESI Bright-time Secondary Targets (DR9/SV3)": "targets-dr9-sv3-sec-bright",
+    "DESI Dark-time Targets (DR9/SV1)": "targets-dr9-sv1-dark",
+    "DESI Bright-time Targets (DR9/SV1)": "targets-dr9-sv1-bright",
+    "DESI Dark-time Secondary Targets (DR9/SV1)": "targets-dr9-sv1-sec-dark",
+    "DESI Bright-time Secondary Targets (DR9/SV1)": "targets-dr9-sv1-sec-bright",
+    "Bright stars": "bright",
+    "Tycho-2 stars": "tycho2",
+    "Star clusters & Planetary Nebulae": "GCs-PNe",
+    "NGC/IC galaxies": "ngc",
+    "Siena Galaxy Atlas": "sga",
+    "HyperLEDA/SGA galaxies": "sga-parent",
+    "DR9 Photo-z": "photoz-dr9",
+    "Constellations": "const",
+})
 
 class LegacySurveyQuery:
+
+    # Whether the FITS cutout of a query has data, keyed by its FITS cutout URL, least recently used entries are evicted
+    data_validity_cache = collections.OrderedDict()
+    data_validity_cache_size = 65536
+    data_validity_cache_lock = threading.Lock()
+
+    # HTTP session shared by every query, so connections to the Legacy Survey are reused
+    session = None
+
+    # Persistent record of the positions where a layer has no data, see setNegativeCache
+    negative_cache = None
+
+    # Footprint map accumulating every observed response, see setFootprintMap
+    footprint_map = None
+
+    # Invalid response statuses which are transient, and so do not mean that there is no data
+    transient_status_codes = (408, 429, 500, 502, 503, 504)
+
+    # Invalid response statuses which mean that the layer has no coverage at the position. Any other invalid response,
+    # such as a 400 for invalid parameters, says nothing about the footprint and is never recorded.
+    no_coverage_status_codes = (404,)
+
     def __init__(self, **kwargs):
         self.input_parameters = kwargs
         self.legacy_survey_parameters = self.customParams(**kwargs)
 
         self.allow_empty_images = self.legacy_survey_parameters["allow_empty"]
 
-    def defaultParams(self):
+    @staticmethod
+    def defaultParams():
         """
         Get a default dictionary of the Legacy Survey API parameters.
 
@@ -56,7 +354,8 @@ class LegacySurveyQuery:
 
         return params
 
-    def customParams(self, **kwargs):
+    @classmethod
+    def customParams(cls, **kwargs):
         """
         Get a custom dictionary of the Legacy Survey API parameters.
 
@@ -76,275 +375,8 @@ class LegacySurveyQuery:
             Default (RA, Dec) are those of WISE 0855.
         """
 
-        special_dict_params = {
-            "decamfoot": ("ra", "dec"),
-            "desifoot": ("ra", "dec"),
-            "desifiber": ("ra", "dec"),
-        }
-
-        valid_layers = {
-            "ls-dr10": None,
-            "ls-dr10-model": None,
-            "ls-dr10-resid": None,
-            "ls-dr10-south": None,
-            "ls-dr10-south-model": None,
-            "ls-dr10-south-resid": None,
-            "ls-dr10-grz": None,
-            "ls-dr10-model-grz": None,
-            "ls-dr10-resid-grz": None,
-            "ls-dr10-south-grz": None,
-            "ls-dr10-south-model-grz": None,
-            "ls-dr10-south-resid-grz": None,
-            "ls-dr9": None,
-            "ls-dr9-model": None,
-            "ls-dr9-resid": None,
-            "ls-dr9.1.1": None,
-            "ls-dr9.1.1-model": None,
-            "ls-dr9.1.1-resid": None,
-            "ls-dr9-north": None,
-            "ls-dr9-north-model": None,
-            "ls-dr9-north-resid": None,
-            "ls-dr9-south": None,
-            "ls-dr9-south-model": None,
-            "ls-dr9-south-resid": None,
-            "ls-dr8": None,
-            "ls-dr8-model": None,
-            "ls-dr8-resid": None,
-            "ls-dr8-north": None,
-            "ls-dr8-north-model": None,
-            "ls-dr8-north-resid": None,
-            "ls-dr8-south": None,
-            "ls-dr8-south-model": None,
-            "ls-dr8-south-resid": None,
-            "ls-dr67": None,
-            "decals-dr7": None,
-            "decals-dr7-model": None,
-            "decals-dr7-resid": None,
-            "mzls+bass-dr6": None,
-            "mzls+bass-dr6-model": None,
-            "mzls+bass-dr6-resid": None,
-            "decals-dr5": None,
-            "decals-dr5-model": None,
-            "decals-dr5-resid": None,
-            "unwise-neo7": None,
-            "unwise-neo6": None,
-            "unwise-neo4": None,
-            "unwise-cat-model": None,
-            "wssa": None,
-            "des-dr1": None,
-            "decaps2": None,
-            "decaps2-model": None,
-            "decaps2-resid": None,
-            "decaps2-riy": None,
-            "decaps2-model-riy": None,
-            "decaps2-resid-riy": None,
-            "galex": None,
-            "halpha": None,
-            "hsc-dr2": None,
-            "hsc-dr3": None,
-            "sdss": None,
-            "sfd": None,
-            "vlass1.2": None,
-        }
-
-        valid_overlays = {
-            "decamfoot": None,
-            "bricks": None,
-            "ccds10": None,
-            "exps10": None,
-            "ccds9": None,
-            "ccds9n": None,
-            "ccds9s": None,
-            "exps9": None,
-            "masks-dr9": None,
-            "ccds8": None,
-            "ccds8n": None,
-            "ccds8s": None,
-            "exps8": None,
-            "ccds7": None,
-            "exps7": None,
-            "exps5": None,
-            "ccds6": None,
-            "ccds5": None,
-            "ccdssdss": None,
-            "unwise_tile": None,
-            "sources-dr10": None,
-            "sources-dr10-south": None,
-            "sources-dr9": None,
-            "sources-dr9n": None,
-            "sources-dr9s": None,
-            "sources-dr8": None,
-            "sources-dr8n": None,
-            "sources-dr8s": None,
-            "sources-dr7": None,
-            "sources-dr6": None,
-            "sources-dr5": None,
-            "gaia-dr2": None,
-            "gaia-edr3": None,
-            "hsc-dr2-cosmos": None,
-            "sdss-cat": None,
-            "manga": None,
-            "spectra": None,
-            "sdss-plates": None,
-            "spectra-deep2": None,
-            "desifoot": (None, None),
-            "desifiber": (None, None),
-            "desi-tiles-edr": None,
-            "desi-spec-edr": None,
-            "targets-dr9-main-dark": None,
-            "targets-dr9-main-bright": None,
-            "targets-dr9-main-sec-dark": None,
-            "targets-dr9-main-sec-bright": None,
-            "targets-dr9-sv3-dark": None,
-            "targets-dr9-sv3-bright": None,
-            "targets-dr9-sv3-sec-dark": None,
-            "targets-dr9-sv3-sec-bright": None,
-            "targets-dr9-sv1-dark": None,
-            "targets-dr9-sv1-bright": None,
-            "targets-dr9-sv1-sec-dark": None,
-            "targets-dr9-sv1-sec-bright": None,
-            "bright": None,
-            "tycho2": None,
-            "GCs-PNe": None,
-            "ngc": None,
-            "sga": None,
-            "sga-parent": None,
-            "photoz-dr9": None,
-            "const": None
-        }
-
-        layer_dictionary = {
-            "Legacy Surveys DR10 images": "ls-dr10",
-            "Legacy Surveys DR10 models": "ls-dr10-model",
-            "Legacy Surveys DR10 residuals": "ls-dr10-resid",
-            "Legacy Surveys DR10-south images": "ls-dr10-south",
-            "Legacy Surveys DR10-south models": "ls-dr10-south-model",
-            "Legacy Surveys DR10-south residuals": "ls-dr10-south-resid",
-            "Legacy Surveys DR10 images (grz)": "ls-dr10-grz",
-            "Legacy Surveys DR10 models (grz)": "ls-dr10-model-grz",
-            "Legacy Surveys DR10 residuals (grz)": "ls-dr10-resid-grz",
-            "Legacy Surveys DR10-south images (grz)": "ls-dr10-south-grz",
-            "Legacy Surveys DR10-south models (grz)": "ls-dr10-south-model-grz",
-            "Legacy Surveys DR10-south residuals (grz)": "ls-dr10-south-resid-grz",
-            "Legacy Surveys DR9 images": "ls-dr9",
-            "Legacy Surveys DR9 models": "ls-dr9-model",
-            "Legacy Surveys DR9 residuals": "ls-dr9-resid",
-            "Legacy Surveys DR9.1.1 COSMOS deep images": "ls-dr9.1.1",
-            "Legacy Surveys DR9.1.1 COSMOS deep models": "ls-dr9.1.1-model",
-            "Legacy Surveys DR9.1.1 COSMOS deep residuals": "ls-dr9.1.1-resid",
-            "Legacy Surveys DR9-north images": "ls-dr9-north",
-            "Legacy Surveys DR9-north models": "ls-dr9-north-model",
-            "Legacy Surveys DR9-north residuals": "ls-dr9-north-resid",
-            "Legacy Surveys DR9-south images": "ls-dr9-south",
-            "Legacy Surveys DR9-south models": "ls-dr9-south-model",
-            "Legacy Surveys DR9-south residuals": "ls-dr9-south-resid",
-            "Legacy Surveys DR8 images": "ls-dr8",
-            "Legacy Surveys DR8 models": "ls-dr8-model",
-            "Legacy Surveys DR8 residuals": "ls-dr8-resid",
-            "Legacy Surveys DR8-north images": "ls-dr8-north",
-            "Legacy Surveys DR8-north models": "ls-dr8-north-model",
-            "Legacy Surveys DR8-north residuals": "ls-dr8-north-resid",
-            "Legacy Surveys DR8-south images": "ls-dr8-south",
-            "Legacy Surveys DR8-south models": "ls-dr8-south-model",
-            "Legacy Surveys DR8-south residuals": "ls-dr8-south-resid",
-            "Legacy Surveys DR6+DR7": "ls-dr67",
-            "DECaLS DR7 images": "decals-dr7",
-            "DECaLS DR7 models": "decals-dr7-model",
-            "DECaLS DR7 residuals": "decals-dr7-resid",
-            "MzLS+BASS DR6 images": "mzls+bass-dr6",
-            "MzLS+BASS DR6 models": "mzls+bass-dr6-model",
-            "MzLS+BASS DR6 residuals": "mzls+bass-dr6-resid",
-            "DECaLS DR5 images": "decals-dr5",
-            "DECaLS DR5 models": "decals-dr5-model",
-            "DECaLS DR5 residuals": "decals-dr5-resid",
-            "unWISE W1/W2 NEO7": "unwise-neo7",
-            "unWISE W1/W2 NEO6": "unwise-neo6",
-            "unWISE W1/W2 NEO4": "unwise-neo4",
-            "unWISE Catalog model": "unwise-cat-model",
-            "WISE 12-micron dust map": "wssa",
-            "DES DR1": "des-dr1",
-            "DECaPS2 images": "decaps2",
-            "DECaPS2 models": "decaps2-model",
-            "DECaPS2 residuals": "decaps2-resid",
-            "DECaPS2 images (riY)": "decaps2-riy",
-            "DECaPS2 models (riY)": "decaps2-model-riy",
-            "DECaPS2 residuals (riY)": "decaps2-resid-riy",
-            "GALEX": "galex",
-            "Halpha maps": "halpha",
-            "HSC DR2": "hsc-dr2",
-            "HSC DR3": "hsc-dr3",
-            "SDSS": "sdss",
-            "SFD Dust": "sfd",
-            "VLASS 1.2": "vlass1.2",
-        }
-
-        overlay_dictionary = {
-            "DECam Footprint": "decamfoot",
-            "Legacy Surveys Bricks": "bricks",
-            "Legacy Surveys DR10 CCDs": "ccds10",
-            "Legacy Surveys DR10 Exposures": "exps10",
-            "Legacy Surveys DR9 CCDs": "ccds9",
-            "Legacy Surveys DR9-north CCDs": "ccds9n",
-            "Legacy Surveys DR9-south CCDs": "ccds9s",
-            "Legacy Surveys DR9-south Exposures": "exps9",
-            "All masks (LS-DR9)": "masks-dr9",
-            "Legacy Surveys DR8 CCDs": "ccds8",
-            "Legacy Surveys DR8-north CCDs": "ccds8n",
-            "Legacy Surveys DR8-south CCDs": "ccds8s",
-            "Legacy Surveys DR8-south Exposures": "exps8",
-            "DECaLS DR7 CCDs": "ccds7",
-            "DECaLS DR7 Exposures": "exps7",
-            "DECaLS DR5 Exposures": "exps5",
-            "MzLS+BASS DR6 CCDs": "ccds6",
-            "DECaLS DR5 CCDs": "ccds5",
-            "SDSS CCDs": "ccdssdss",
-            "unWISE tiles": "unwise_tile",
-            "Legacy Surveys DR10 Catalog": "sources-dr10",
-            "Legacy Surveys DR10-south Catalog": "sources-dr10-south",
-            "Legacy Surveys DR9 Catalog": "sources-dr9",
-            "Legacy Surveys DR9-north Catalog": "sources-dr9n",
-            "Legacy Surveys DR9-south Catalog": "sources-dr9s",
-            "Legacy Surveys DR8 Catalog": "sources-dr8",
-            "Legacy Surveys DR8-north Catalog": "sources-dr8n",
-            "Legacy Surveys DR8-south Catalog": "sources-dr8s",
-            "DECaLS DR7 catalog": "sources-dr7",
-            "MzLS+BASS DR6 Catalog": "sources-dr6",
-            "DECaLS DR5 Catalog": "sources-dr5",
-            "Gaia DR2 catalog": "gaia-dr2",
-            "Gaia EDR3 catalog": "gaia-edr3",
-            "HSC DR2 COSMOS catalog": "hsc-dr2-cosmos",
-            "SDSS catalog": "sdss-cat",
-            "MaNGa IFU Spectra": "manga",
-            "SDSS Spectra (DR16)": "spectra",
-            "SDSS Spectro Plates": "sdss-plates",
-            "DEEP2 Spectra": "spectra-deep2",
-            "DESI Footprint": "desifoot",
-            "DESI Fibers": "desifiber",
-            "DESI EDR tiles": "desi-tiles-edr",
-            "DESI EDR spectra": "desi-spec-edr",
-            "DESI Dark-time Targets (DR9/Main)": "targets-dr9-main-dark",
-            "DESI Bright-time Targets (DR9/Main)": "targets-dr9-main-bright",
-            "DESI Dark-time Secondary Targets (DR9/Main)": "targets-dr9-main-sec-dark",
-            "DESI Bright-time Secondary Targets (DR9/Main)": "targets-dr9-main-sec-bright",
-            "DESI Dark-time Targets (DR9/SV3)": "targets-dr9-sv3-dark",
-            "DESI Bright-time Targets (DR9/SV3)": "targets-dr9-sv3-bright",
-            "DESI Dark-time Secondary Targets (DR9/SV3)": "targets-dr9-sv3-sec-dark",
-            "DESI Bright-time Secondary Targets (DR9/SV3)": "targets-dr9-sv3-sec-bright",
-            "DESI Dark-time Targets (DR9/SV1)": "targets-dr9-sv1-dark",
-            "DESI Bright-time Targets (DR9/SV1)": "targets-dr9-sv1-bright",
-            "DESI Dark-time Secondary Targets (DR9/SV1)": "targets-dr9-sv1-sec-dark",
-            "DESI Bright-time Secondary Targets (DR9/SV1)": "targets-dr9-sv1-sec-bright",
-            "Bright stars": "bright",
-            "Tycho-2 stars": "tycho2",
-            "Star clusters & Planetary Nebulae": "GCs-PNe",
-            "NGC/IC galaxies": "ngc",
-            "Siena Galaxy Atlas": "sga",
-            "HyperLEDA/SGA galaxies": "sga-parent",
-            "DR9 Photo-z": "photoz-dr9",
-            "Constellations": "const",
-        }
 
-        params = self.defaultParams()
+        params = cls.defaultParams()
 
         if("overlays" in kwargs):
             overlays = kwargs["overlays"]
@@ -502,6 +534,12 @@ class LegacySurveyQuery:
     def getParameters(self):
         return self.legacy_survey_parameters
 
+    @classmethod
+    def getSession(cls):
+        if (cls.session is None):
+            cls.session = requests.Session()
+        return cls.session
+
     def getViewerURL(self):
         viewer_url_base = "https://www.legacysurvey.org/viewer?"
         viewer_url = self.addParametersToURL(viewer_url_base)
@@ -518,27 +556,349 @@ class LegacySurveyQuery:
         return cutout_url
 
     def addParametersToURL(self, url_base):
+        return self.parametersToURL(url_base, self.legacy_survey_parameters)
+
+    @staticmethod
+    def parametersToURL(url_base, parameters):
+        """
+        Add validated Legacy Survey parameters to a URL.
+
+        Parameters
+        ----------
+        url_base : str
+            The URL to add the parameters to, ending with "?".
+        parameters : dict
+            Legacy Survey parameters, as validated by customParams.
+
+        Returns
+        -------
+        url : str
+            The URL with the parameters.
+        """
+
         url = url_base
-        for key in self.legacy_survey_parameters:
-            if(self.legacy_survey_parameters[key] != False and self.legacy_survey_parameters[key] != (None, None)):
-                if(type(self.legacy_survey_parameters[key]) == tuple):
-                    tuple_str = str(self.legacy_survey_parameters[key])[1:-1]
+        for key in parameters:
+            if(parameters[key] is not False and parameters[key] != (None, None)):
+                if(type(parameters[key]) == tuple):
+                    tuple_str = str(parameters[key])[1:-1]
                     url += f"{key}={tuple_str}&"
-                elif(type(self.legacy_survey_parameters[key]) == bool):
+                elif(type(parameters[key]) == bool):
                     url += f"{key}&"
                 else:
                     # Handle special cases
                     if(key == "overlays"):
-                        for overlay in self.legacy_survey_parameters[key]:
+                        for overlay in parameters[key]:
                             url += f"{overlay}&"
                     elif(key == "fov"):
-                        pixel_scale = self.legacy_survey_parameters["pixscale"]
-                        size = int(self.legacy_survey_parameters["fov"] / pixel_scale)
+                        pixel_scale = parameters["pixscale"]
+                        size = int(parameters["fov"] / pixel_scale)
                         url += f"size={size}&"
                     else:
-                        url += f"{key}={self.legacy_survey_parameters[key]}&"
+                        url += f"{key}={parameters[key]}&"
         return url
 
+    @classmethod
+    def setNegativeCache(cls, negative_cache):
+        """
+        Set the negative cache consulted before every request of every query, or None to disable it.
+
+        Parameters
+        ----------
+        negative_cache : NegativeCache.NegativeCache or None
+            The cache recording the positions where a layer has no data.
+        """
+
+        cls.negative_cache = negative_cache
+
+    @classmethod
+    def setFootprintMap(cls, footprint_map):
+        """
+        Set the footprint map into which every FITS cutout response of every query is accumulated, or None to disable it.
+
+        Parameters
+        ----------
+        footprint_map : FootprintMap.FootprintMap or None
+            The footprint map, which can be saved and later used to pre-filter catalogs with FootprintMap.covers.
+        """
+
+        cls.footprint_map = footprint_map
+
+    def isKnownEmpty(self):
+        """
+        Check whether the negative cache records that the layer of this query has no data at its position.
+        """
+
+        if (self.negative_cache is None):
+            return False
+        return self.negative_cache.isEmpty(self.legacy_survey_parameters["layer"], self.legacy_survey_parameters["ra"], self.legacy_survey_parameters["dec"])
+
+    @classmethod
+    def getCachedDataValidity(cls, fits_query_url):
+        """
+        Get the cached result of hasData for a FITS cutout URL, or None if it is not cached.
+        """
+
+        with cls.data_validity_cache_lock:
+            if (fits_query_url not in cls.data_validity_cache):
+                return None
+            cls.data_validity_cache.move_to_end(fits_query_url)
+            return cls.data_validity_cache[fits_query_url]
+
+    @classmethod
+    def cacheDataValidity(cls, fits_query_url, has_data):
+        with cls.data_validity_cache_lock:
+            cls.data_validity_cache[fits_query_url] = has_data
+            cls.data_validity_cache.move_to_end(fits_query_url)
+            while (len(cls.data_validity_cache) > cls.data_validity_cache_size):
+                cls.data_validity_cache.popitem(last=False)
+
+    def recordFITSResponse(self, fits_query_url, response):
+        """
+        Record whether the FITS cutout of this query has data, from its response.
+        """
+
+        # Transient failures and invalid requests say nothing about the data, so they are not recorded
+        if (not response.ok and response.status_code not in self.no_coverage_status_codes):
+            return
+
+        self.cacheDataValidity(fits_query_url, response.ok)
+
+        layer, ra, dec = self.legacy_survey_parameters["layer"], self.legacy_survey_parameters["ra"], self.legacy_survey_parameters["dec"]
+        if (not response.ok and self.negative_cache is not None):
+            self.negative_cache.record(layer, ra, dec)
+        if (self.footprint_map is not None):
+            self.footprint_map.addObservations(layer, ra, dec, response.ok)
+
+    def requestFITSResponse(self, stream=False):
+        """
+        Request the FITS cutout of this query, unless the negative cache records that there is no data.
+
+        Returns
+        -------
+        response : requests.Response or None
+            The FITS cutout response, which may not be valid, or None if the request was skipped.
+        """
+
+        if (self.isKnownEmpty()):
+            return None
+
+        fits_query_url = self.getFITSCutoutURL()
+        response = self.getSession().get(fits_query_url, stream=stream)
+        self.recordFITSResponse(fits_query_url, response)
+        return response
+
+    def hasData(self):
+        """
+        Check whether the FITS cutout of this query has data, which is False for an empty region of the layer.
+
+        Returns
+        -------
+        has_data : bool
+            True if the FITS cutout URL gives a valid response.
+
+        Notes
+        -----
+        The FITS request is streamed, so the body of a valid cutout is not downloaded, although the server still renders
+        it. The result is cached per FITS cutout URL in data_validity_cache, and any full FITS download of the same
+        cutout, or JPEG cutout with visible data, records its result there too. Positions recorded in the negative cache
+        are reported as empty without any request.
+        """
+
+        has_data = self.getCachedDataValidity(self.getFITSCutoutURL())
+        if (has_data is not None):
+            return has_data
+
+        fits_response = self.requestFITSResponse(stream=True)
+        if (fits_response is None):
+            return False
+
+        if (fits_response.ok):
+            fits_response.close()
+        else:
+            # Reading the short error body returns the connection to the session pool instead of discarding it
+            fits_response.content
+        return fits_response.ok
+
+    @staticmethod
+    def isBlankImage(image_data, threshold=8):
+        """
+        Check whether encoded image bytes decode to a (nearly) black image, which is how the JPEG cutouts of regions
+        without data are rendered.
+        """
+
+        with Image.open(BytesIO(image_data)) as image:
+            return np.asarray(image.convert("L")).max() <= threshold
+
+    def requestCutout(self):
+        """
+        Request the cutout of this query, a FITS cutout if subimage is set and a JPEG cutout otherwise.
+
+        Returns
+        -------
+        response : requests.Response or None
+            The cutout response, or None if the response is not valid or, unless allow_empty is set, the region has no data.
+
+        Notes
+        -----
+        A FITS cutout response is its own existence check, so a subimage costs one request. A JPEG cutout is requested
+        first, and a JPEG showing data is taken as proof that the region has data, so the common case also costs one
+        request. Only a blank JPEG, which is also what an empty region renders to, is checked with hasData. Cutouts
+        already known to be empty, from data_validity_cache or the negative cache, are skipped without any request.
+        """
+
+        if(self.legacy_survey_parameters["subimage"]):
+            response = self.requestFITSResponse()
+        else:
+            fits_query_url = self.getFITSCutoutURL()
+            has_data = None
+            if(not self.allow_empty_images):
+                has_data = self.getCachedDataValidity(fits_query_url)
+                if(has_data is False or (has_data is None and self.isKnownEmpty())):
+                    return None
+
+            response = self.getSession().get(self.getJPGCutoutURL())
+
+            if(response.ok and not self.allow_empty_images and has_data is None):
+                if(not self.isBlankImage(response.content)):
+                    self.cacheDataValidity(fits_query_url, True)
+                elif(not self.hasData()):
+                    return None
+
+        if response is None or not response.ok:
+            return None
+
+        return response
+
+    def requestImage(self):
+        """
+        Request the image in memory, without writing any file.
+
+        Returns
+        -------
+        image : PIL.Image.Image or None
+            The image, or None if there is no data for this layer and position.
+        """
+
+        response = self.requestCutout()
+
+        # Verify that the response is valid
+        if response is None:
+            return None
+
+        if (self.legacy_survey_parameters["subimage"]):
+            with fits.open(BytesIO(response.content)) as hdul:
+                return self.FITSDataToImage(hdul[1].data)
+
+        image = Image.open(BytesIO(response.content))
+        image.load()
+        return image
+
+    @staticmethod
+    def resolveLayer(layer):
+        """
+        Get the layer identifier of a layer given by its identifier or by its viewer name.
+        """
+
+        if(layer in valid_layers):
+            return layer
+        elif(layer in layer_dictionary):
+            return layer_dictionary[layer]
+        else:
+            raise ValueError(f"The following layer is not valid: {layer}. The available layers are: {list(valid_layers.keys())}.")
+
+    def withLayers(self, layer, blink=False):
+        """
+        Get a query with the same, already validated, parameters as this one but other layers, without validating them
+        all again.
+        """
+
+        layer_query = LegacySurveyQuery.__new__(LegacySurveyQuery)
+        layer_query.input_parameters = dict(self.input_parameters, layer=layer)
+        layer_query.input_parameters.pop("blink", None)
+        layer_query.legacy_survey_parameters = dict(self.legacy_survey_parameters, layer=self.resolveLayer(layer), blink=False)
+        if(blink != False):
+            layer_query.input_parameters["blink"] = blink
+            layer_query.legacy_survey_parameters["blink"] = self.resolveLayer(blink)
+        layer_query.allow_empty_images = self.allow_empty_images
+        return layer_query
+
+    def getBlinkLayerQuery(self):
+        """
+        Get a query with the same parameters as this one, but with the layer and blink layer swapped.
+        """
+
+        return self.withLayers(self.legacy_survey_parameters["blink"], self.legacy_survey_parameters["layer"])
+
+    def getLayerQuery(self, layer):
+        """
+        Get a query with the same parameters as this one, but for another layer and without a blink layer.
+        """
+
+        return self.withLayers(layer)
+
+    def getLayerQueries(self, extra_layers=None):
+        """
+        Get the queries of every layer involved in this query.
+
+        Parameters
+        ----------
+        extra_layers : list
+            Additional layers to query at the same position.
+
+        Returns
+        -------
+        queries : list
+            This query, then the blink layer query if the blink parameter is set, then one query per extra layer.
+        """
+
+        queries = [self]
+        if (self.legacy_survey_parameters["blink"] != False):
+            queries.append(self.getBlinkLayerQuery())
+        for layer in (extra_layers if extra_layers is not None else []):
+            queries.append(self.getLayerQuery(layer))
+        return queries
+
+    def getBlinkSpriteSheet(self, output_directory=None, filename=None, columns=None):
+        """
+        Create one sprite sheet image holding the primary and blink layer images, with a JSON sidecar of the frame offsets
+        and layers.
+
+        Parameters
+        ----------
+        output_directory : str
+            The directory to save the sprite sheet.
+        filename : str
+            The name of the sprite sheet image file.
+        columns : int
+            Number of frames per row. Defaults to both frames side by side.
+
+        Returns
+        -------
+        sheet_filepath : str
+            The filepath of the sprite sheet image, or None if one of the layers has no data.
+        sidecar_filepath : str
+            The filepath of the JSON sidecar, or None if one of the layers has no data.
+        """
+
+        if (self.legacy_survey_parameters["blink"] == False):
+            raise ValueError("The blink parameter must be set to a valid layer.")
+
+        if (output_directory is None):
+            output_directory = os.getcwd()
+
+        if (filename is None):
+            filename = "RA" + str(self.legacy_survey_parameters["ra"]) + "_DEC" + str(self.legacy_survey_parameters["dec"]) + f"layer{self.legacy_survey_parameters['layer']}-{self.legacy_survey_parameters['blink']}" + "_sprites.png"
+
+        # Fetch both layers concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            primary_image, blink_image = executor.map(LegacySurveyQuery.requestImage, self.getLayerQueries())
+
+        if (primary_image is None or blink_image is None):
+            return None, None
+
+        layers = [self.legacy_survey_parameters["layer"], self.legacy_survey_parameters["blink"]]
+        return FlipbookWriter.writeSpriteSheet([primary_image, blink_image], f"{output_directory}/{filename}", columns=columns, labels=layers, metadata={"legacy_survey_parameters": self.legacy_survey_parameters})
+
     def getImage(self, output_directory=None, filename=None):
         """
         Get the image in the specified format.
@@ -564,50 +924,50 @@ class LegacySurveyQuery:
         if(image_format.lower() not in ["jpg", "jpeg", "png",]):
             raise ValueError(f"Invalid image format: {image_format}. The available formats are: jpg, jpeg, png.")
 
-        if(self.legacy_survey_parameters["subimage"]):
-            query_url = self.getFITSCutoutURL()
-        else:
-            query_url = self.getJPGCutoutURL()
-
-        if(not self.allow_empty_images):
-            fits_query_url = self.getFITSCutoutURL()
-            fits_response = requests.get(fits_query_url)
-            if not fits_response.ok:
-                return None, None
-
-        response = requests.get(query_url)
+        response = self.requestCutout()
 
         # Verify that the response is valid
-        if not response.ok:
+        if response is None:
             return None, None
 
         if (self.legacy_survey_parameters["subimage"]):
-            fits_filename = filename.replace(image_format.lower(), ".fits")
-
-            # Use the response bytes to create a FITS file
-            with open(f"{output_directory}/{fits_filename}", "wb") as file:
-                file.write(response.content)
-
-            # Create an image from the FITS file
-            image_filepath = self.convertFITS(f"{output_directory}/{fits_filename}", output_directory, filename, format=image_format)
-            os.remove(f"{output_directory}/{fits_filename}")
-            return image_filepath
+            # Parse the FITS cutout straight from the response bytes
+            with fits.open(BytesIO(response.content)) as hdul:
+                image = self.FITSDataToImage(hdul[1].data)
         else:
             image = Image.open(BytesIO(response.content))
 
-            # Verify that the output directory exists
-            if not os.path.exists(output_directory):
-                raise FileNotFoundError(f"The output directory {output_directory} does not exist.")
+        # Verify that the output directory exists
+        if not os.path.exists(output_directory):
+            raise FileNotFoundError(f"The output directory {output_directory} does not exist.")
 
-            image_filepath = f"{output_directory}/{filename}"
+        image_filepath = f"{output_directory}/{filename}"
 
-            # Save the image
-            image.save(image_filepath)
+        # Save the image
+        PostProcessing.saveImage(image, image_filepath)
 
-            # Image size
-            image_size = image.size
+        # Image size
+        image_size = image.size
 
-            return image_filepath, image_size
+        return image_filepath, image_size
+
+    def requestFITS(self):
+        """
+        Request the FITS cutout in memory, without writing any file.
+
+        Returns
+        -------
+        hdul : astropy.io.fits.HDUList or None
+            The FITS cutout, or None if the response is not valid.
+        """
+
+        response = self.requestFITSResponse()
+
+        # Verify that the response is valid
+        if response is None or not response.ok:
+            return None
+
+        return fits.open(BytesIO(response.content))
 
     def getFITS(self, output_directory=None, filename=None):
         """
@@ -623,9 +983,13 @@ class LegacySurveyQuery:
         Returns
         -------
         fits_filepath : str
-            The filepath of the FITS file.
+            The filepath of the FITS file, or None if the response is not valid.
         image_size : tuple
             The size of the image.
+
+        Notes
+        -----
+        Use requestFITS to get the cutout in memory without writing a file.
         """
 
         if(output_directory is None):
@@ -640,27 +1004,137 @@ class LegacySurveyQuery:
 
         # Get the FITS file
         fits_filepath = f"{output_directory}/{filename}"
-        query_url = self.getFITSCutoutURL()
-
-        response = requests.get(query_url)
+        response = self.requestFITSResponse()
 
         # Verify that the response is valid
-        if not response.ok:
+        if response is None or not response.ok:
             return None, None
 
-        # Use the response bytes to create a FITS file
-        with open(fits_filepath, "wb") as file:
-            file.write(response.content)
-
-        # Get the image size
-        with fits.open(fits_filepath) as hdul:
+        # Get the image size from the response bytes
+        with fits.open(BytesIO(response.content)) as hdul:
             image_width = hdul[0].header["IMAGEW"]
             image_height = hdul[0].header["IMAGEH"]
 
         image_size = (image_width, image_height)
 
+        # Use the response bytes to create a FITS file
+        with open(fits_filepath, "wb") as file:
+            file.write(response.content)
+
         return fits_filepath, image_size
 
+    @staticmethod
+    def FITSToColorImage(hdul, band_weights=None, stretch="asinh", Q=20.0, minimum=0.0, maximum=1.0):
+        """
+        Compose the multi-band cube of a FITS cutout into a color image.
+
+        Parameters
+        ----------
+        hdul : astropy.io.fits.HDUList
+            The FITS cutout. The first HDU with image data is used, with its planes named by the BAND0, BAND1, ... keywords.
+        band_weights, stretch, Q, minimum, maximum
+            See ColorComposition.composeRGB.
+
+        Returns
+        -------
+        image : PIL.Image.Image
+            The RGB image, north up.
+        """
+
+        for hdu in hdul:
+            if (hdu.data is not None and hdu.data.ndim in [2, 3]):
+                break
+        else:
+            raise ValueError("The FITS cutout has no image data.")
+
+        band_count = hdu.data.shape[0] if hdu.data.ndim == 3 else 1
+        bands = ColorComposition.getBandNames(hdu.header, band_count)
+        if (bands is None):
+            raise ValueError("The FITS cutout does not name the band of every plane (BAND0, BAND1, ... keywords).")
+
+        return ColorComposition.composeImage(hdu.data, bands, band_weights, stretch, Q, minimum, maximum)
+
+    def getColorImage(self, output_directory=None, filename=None, fits_filename=None, band_weights=None, stretch="asinh", Q=20.0, minimum=0.0, maximum=1.0):
+        """
+        Get a color image composed locally from the multi-band FITS cutout, so a single download gives both the science
+        data and the display image.
+
+        Parameters
+        ----------
+        output_directory : str
+            The directory to save the files.
+        filename : str
+            The name of the color image file.
+        fits_filename : str
+            If given, the FITS cutout is also saved under this name.
+        band_weights, stretch, Q, minimum, maximum
+            See ColorComposition.composeRGB.
+
+        Returns
+        -------
+        image_filepath : str
+            The filepath of the color image.
+        image_size : tuple
+            The size of the image.
+        """
+
+        if(output_directory is None):
+            output_directory = os.getcwd()
+
+        if (filename is None):
+            filename = "RA" + str(self.legacy_survey_parameters["ra"]) + "_DEC" + str(self.legacy_survey_parameters["dec"]) + f"layer{self.legacy_survey_parameters['layer']}" + "_color.png"
+
+        if (fits_filename is not None and fits_filename.split(".")[-1].lower() != "fits"):
+            raise ValueError("The FITS filename must have a FITS extension.")
+
+        response = self.requestFITSResponse()
+
+        # Verify that the response is valid
+        if response is None or not response.ok:
+            return None, None
+
+        with fits.open(BytesIO(response.content)) as hdul:
+            image = self.FITSToColorImage(hdul, band_weights, stretch, Q, minimum, maximum)
+
+        image_filepath = f"{output_directory}/{filename}"
+        PostProcessing.saveImage(image, image_filepath)
+
+        if (fits_filename is not None):
+            with open(f"{output_directory}/{fits_filename}", "wb") as file:
+                file.write(response.content)
+
+        return image_filepath, image.size
+
+    def getBlinkImageFilenames(self, primary_layer_filename=None, blink_layer_filename=None):
+        """
+        Get the file names given to the two images for the blink comparison.
+
+        Parameters
+        ----------
+        primary_layer_filename : str
+            The base name of the primary image file.
+        blink_layer_filename : str
+            The base name of the blink image file.
+
+        Returns
+        -------
+        primary_layer_filename : str
+            The name of the primary image file, with the "_primary" suffix.
+        blink_layer_filename : str
+            The name of the blink image file, with the "_blink" suffix.
+        """
+
+        if(primary_layer_filename is None):
+            primary_layer_filename = "RA" + str(self.legacy_survey_parameters["ra"]) + "_DEC" + str(self.legacy_survey_parameters["dec"]) + f"layer{self.legacy_survey_parameters['layer']}" + ".png"
+
+        if(blink_layer_filename is None):
+            blink_layer_filename = "RA" + str(self.legacy_survey_parameters["ra"]) + "_DEC" + str(self.legacy_survey_parameters["dec"]) + f"layer{self.legacy_survey_parameters['blink']}" + ".png"
+
+        primary_filename_base, extension = os.path.splitext(primary_layer_filename)
+        blink_filename_base, blink_extension = os.path.splitext(blink_layer_filename)
+
+        return primary_filename_base + "_primary" + extension, blink_filename_base + "_blink" + blink_extension
+
     def getBlinkImages(self, output_directory=None, primary_layer_filename=None, blink_layer_filename=None):
         """
         Get the two images for the blink comparison.
@@ -688,27 +1162,217 @@ class LegacySurveyQuery:
         if (output_directory is None):
             output_directory = os.getcwd()
 
-        if(primary_layer_filename is None):
-            primary_layer_filename = "RA" + str(self.legacy_survey_parameters["ra"]) + "_DEC" + str(self.legacy_survey_parameters["dec"]) + f"layer{self.legacy_survey_parameters['layer']}" + ".png"
+        primary_layer_filename, blink_layer_filename = self.getBlinkImageFilenames(primary_layer_filename, blink_layer_filename)
 
-        if(blink_layer_filename is None):
-            blink_layer_filename = "RA" + str(self.legacy_survey_parameters["ra"]) + "_DEC" + str(self.legacy_survey_parameters["dec"]) + f"layer{self.legacy_survey_parameters['blink']}" + ".png"
+        # Get the parameters of the current object but replace the layer with the blink layer
+        blink_lsq = self.getBlinkLayerQuery()
 
-        primary_filename_base, extension = os.path.splitext(primary_layer_filename)
-        primary_layer_image_filepath, primary_image_size = self.getImage(output_directory, primary_filename_base + "_primary" + extension)
+        # Fetch both layers concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            primary_future = executor.submit(self.getImage, output_directory, primary_layer_filename)
+            blink_future = executor.submit(blink_lsq.getImage, output_directory, blink_layer_filename)
+            primary_layer_image_filepath, primary_image_size = primary_future.result()
+            blink_layer_image_filepath, blink_image_size = blink_future.result()
 
-        # Get the parameters of the current object but replace the layer with the blink layer
-        blink_parameters = self.input_parameters.copy()
-        blink_parameters["layer"], blink_parameters["blink"] = self.legacy_survey_parameters["blink"], self.legacy_survey_parameters["layer"]
-        blink_lsq = LegacySurveyQuery(**blink_parameters)
+        return [primary_layer_image_filepath, blink_layer_image_filepath], [primary_image_size, blink_image_size]
 
-        blink_filename_base, extension = os.path.splitext(blink_layer_filename)
+    def getLayerImageFilenames(self, layers):
+        """
+        Get the file names given to the images of a multi-layer flipbook, numbered in display order.
 
-        blink_layer_image_filepath, blink_image_size = blink_lsq.getImage(output_directory, blink_filename_base + "_blink" + extension)
+        Parameters
+        ----------
+        layers : list
+            The layers of the flipbook.
 
-        return [primary_layer_image_filepath, blink_layer_image_filepath], [primary_image_size, blink_image_size]
+        Returns
+        -------
+        layer_filenames : list
+            The name of the image file of each layer.
+        """
+
+        filename_base = "RA" + str(self.legacy_survey_parameters["ra"]) + "_DEC" + str(self.legacy_survey_parameters["dec"])
+        return [filename_base + f"layer{layer}_{index:02d}.png" for index, layer in enumerate(layers)]
+
+    def getLayerImages(self, layers, output_directory=None, max_workers=8):
+        """
+        Get one image per layer at the position of this query, for a multi-layer flipbook.
+
+        Parameters
+        ----------
+        layers : list
+            The layers to fetch, in display order. Each layer must be valid for the layer parameter.
+        output_directory : str
+            The directory to save the images.
+        max_workers : int
+            Maximum number of concurrent layer downloads.
+
+        Returns
+        -------
+        layer_image_filepaths : list
+            The filepath of the image of each layer, all with the same size.
+        image_sizes : list
+            The size of each image.
+
+        Notes
+        -----
+        The layers are fetched concurrently. Layers with a different pixel size (for example unWISE and Legacy Surveys
+        layers cover the field of view with different pixel counts) are resized to the largest image size with the
+        nearest-neighbor algorithm, so every frame lines up.
+        If one of the layers has no data, the returned lists hold None for it and no resizing is done.
+        """
+
+        if (len(layers) == 0):
+            raise ValueError("At least one layer is needed.")
+
+        if (output_directory is None):
+            output_directory = os.getcwd()
+
+        layer_queries = [self.getLayerQuery(layer) for layer in layers]
+        layer_filenames = self.getLayerImageFilenames([layer_query.legacy_survey_parameters["layer"] for layer_query in layer_queries])
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(LegacySurveyQuery.getImage, layer_queries, [output_directory] * len(layers), layer_filenames))
+
+        layer_image_filepaths = [result[0] for result in results]
+        image_sizes = [result[1] for result in results]
+
+        if (None in layer_image_filepaths):
+            return layer_image_filepaths, image_sizes
+
+        # Normalize the sizes to the largest image
+        target_size = max(image_sizes, key=lambda size: size[0] * size[1])
+        for index, f in enumerate(layer_image_filepaths):
+            if (image_sizes[index] != target_size):
+                PostProcessing.resizeImage(f, target_size)
+                image_sizes[index] = target_size
+
+        return layer_image_filepaths, image_sizes
+
+    def downloadModifiedLegacySurveyLayerImages(self, layers, output_directory=None, scale_factor=1.0, addGrid=False, gridCount=5, gridType = "Solid", gridColor = (0,0,0), incremental=False, materialize_scale=True):
+        """
+        Generates a set of modified PNG files, one per layer, for a multi-layer flipbook from the Legacy Survey API.
+
+        Parameters
+        ----------
+            layers : list
+                The layers of the flipbook, in display order.
+            output_directory : str
+                Output directory of the PNG files
+            scale_factor, addGrid, gridCount, gridType, gridColor, incremental, materialize_scale
+                See downloadModifiedLegacySurveyBlinkImages.
+
+        Returns
+        -------
+            flist : list of str
+                List of (full path) file names of PNG images
+            size_list : list of tuple
+                List of the image sizes
+        """
+
+        if (output_directory is None):
+            output_directory = os.getcwd()
+
+        if (not os.path.exists(output_directory)):
+            os.mkdir(output_directory)
+
+        functions = [PostProcessing.scaleImage, PostProcessing.applyGridToImage]
+        function_args = [(scale_factor, False, materialize_scale), (addGrid, gridCount, gridType, gridColor)]
+
+        if (incremental):
+            request_key = PostProcessing.requestKey({"parameters": dict(self.legacy_survey_parameters), "layers": list(layers)})
+            raw_directory = PostProcessing.getRawDirectory(output_directory, request_key)
+
+            raw_flist = [os.path.join(raw_directory, raw_filename) for raw_filename in self.getLayerImageFilenames(layers)]
+            if (all(os.path.exists(raw_file) for raw_file in raw_flist)):
+                size_list = []
+                for raw_file in raw_flist:
+                    with Image.open(raw_file) as img:
+                        size_list.append(img.size)
+            else:
+                raw_flist, size_list = self.getLayerImages(layers, raw_directory)
+
+            if (None in raw_flist):
+                return raw_flist, size_list
+
+            flist = PostProcessing.rebuildModifiedFiles(raw_flist, output_directory, functions, function_args, request_key)
+        else:
+            flist, size_list = self.getLayerImages(layers, output_directory)
+
+            if (None in flist):
+                return flist, size_list
+
+            PostProcessing.applyModifications(flist, functions, function_args)
+
+        if(scale_factor != 1):
+            for index, f in enumerate(flist):
+                with Image.open(f) as img:
+                    size_list[index] = img.size
+
+        return flist, size_list
+
+    def getLayerFlipbook(self, layers, output_directory=None, filename=None, duration=0.5, output_format="gif", scale_factor=1.0, addGrid=False, gridCount=5, gridType="Solid", gridColor=(0,0,0), delete_images=True):
+        """
+        Get a flipbook cycling through several layers at the position of this query, such as
+        ["ls-dr8", "ls-dr9", "ls-dr10", "unwise-neo4", "unwise-neo6", "unwise-neo7"].
+
+        Parameters
+        ----------
+        layers : list
+            The layers of the flipbook, in display order.
+        output_directory : str
+            The directory to save the flipbook.
+        filename : str
+            The name of the animation file. The extension is set by output_format.
+        duration : float
+            Time interval in seconds for each frame.
+        output_format : str
+            Animation format, one of "gif", "apng", "webp" or "webp-lossy".
+        scale_factor, addGrid, gridCount, gridType, gridColor
+            Post-processing of the frames, see downloadModifiedLegacySurveyBlinkImages.
+        delete_images : bool
+            Delete the frame images after having used them to construct the flipbook.
+
+        Returns
+        -------
+        animation_filepath : str
+            The filepath of the animation, or None if one of the layers has no data.
+        image_size : tuple
+            The size of the frames, or None if one of the layers has no data.
+        """
+
+        if(output_format not in FlipbookWriter.animation_extensions):
+            raise ValueError(f"Invalid output format: {output_format}. The available formats are: {list(FlipbookWriter.animation_extensions.keys())}.")
+
+        if (output_directory is None):
+            output_directory = os.getcwd()
+
+        if (filename is None):
+            filename = "RA" + str(self.legacy_survey_parameters["ra"]) + "_DEC" + str(self.legacy_survey_parameters["dec"]) + "layers" + "-".join(layers)
 
-    def getBlinkGIF(self, output_directory=None, filename=None, blink_speed=0.5):
+        flist, size_list = self.downloadModifiedLegacySurveyLayerImages(layers, output_directory, scale_factor=scale_factor, addGrid=addGrid, gridCount=gridCount, gridType=gridType, gridColor=gridColor)
+
+        if (None in flist):
+            for f in flist:
+                if (f is not None and delete_images):
+                    os.remove(f)
+            return None, None
+
+        # Only strip a known image or animation extension, positions contain decimal points
+        filename_base, extension = os.path.splitext(filename)
+        if (extension.lower() not in list(FlipbookWriter.animation_extensions.values()) + [".jpg", ".jpeg"]):
+            filename_base = filename
+
+        animation_filepath = f"{output_directory}/{filename_base}{FlipbookWriter.animation_extensions[output_format]}"
+        FlipbookWriter.writeAnimation(flist, animation_filepath, duration=duration, output_format=output_format, loop=0)
+
+        if (delete_images):
+            for f in flist:
+                os.remove(f)
+
+        return animation_filepath, size_list[0]
+
+    def getBlinkGIF(self, output_directory=None, filename=None, blink_speed=0.5, output_format="gif"):
         """
         Get the blink gif between the main layer and the blink layer.
 
@@ -720,14 +1384,20 @@ class LegacySurveyQuery:
             The name of the gif file.
         blink_speed : float
             The loop speed of the gif in seconds.
+        output_format : str
+            Animation format, one of "gif", "apng", "webp" or "webp-lossy". The file extension is set accordingly.
 
         Returns
         -------
         image_filepath : str
-            The filepath of the image.
+            The filepath of the image, or None if one of the layers has no data.
 
         image_size : tuple
-            The size of the image.
+            The size of the image, or None if one of the layers has no data.
+
+        Notes
+        -----
+        Both layers are fetched concurrently and decoded in memory, so the animation is the only file written.
         """
 
         if (self.legacy_survey_parameters["blink"] == False):
@@ -739,23 +1409,15 @@ class LegacySurveyQuery:
         if (filename is None):
             filename = "RA" + str(self.legacy_survey_parameters["ra"]) + "_DEC" + str(self.legacy_survey_parameters["dec"]) + f"layer{self.legacy_survey_parameters['layer']}-{self.legacy_survey_parameters['blink']}" + ".png"
 
-        image_filepaths, image_sizes = self.getBlinkImages(output_directory)
-
-        primary_layer_image_filepath = image_filepaths[0]
-        blink_layer_image_filepath = image_filepaths[1]
-
-        filename_base, extension = os.path.splitext(filename)
-
-        # Create a gif from the two images using PIL
-        gif_filepath = f"{output_directory}/{filename_base}.gif"
+        if(output_format not in FlipbookWriter.animation_extensions):
+            raise ValueError(f"Invalid output format: {output_format}. The available formats are: {list(FlipbookWriter.animation_extensions.keys())}.")
 
-        # Open the two images
-        primary_image = Image.open(primary_layer_image_filepath)
-        blink_image = Image.open(blink_layer_image_filepath)
+        # Fetch both layers concurrently, in memory
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            primary_image, blink_image = executor.map(LegacySurveyQuery.requestImage, self.getLayerQueries())
 
-        # Ensure both images are in the same mode and size
-        primary_image = primary_image.convert('RGBA')
-        blink_image = blink_image.convert('RGBA')
+        if(primary_image is None or blink_image is None):
+            return None, None
 
         # Check if the image sizes are the same
         if(primary_image.size != blink_image.size):
@@ -763,22 +1425,38 @@ class LegacySurveyQuery:
 
         image_size = primary_image.size
 
-        # Create a list of images
-        images = [primary_image, blink_image]
+        filename_base, extension = os.path.splitext(filename)
+        gif_filepath = f"{output_directory}/{filename_base}{FlipbookWriter.animation_extensions[output_format]}"
 
-        # Set the duration for each frame (in milliseconds)
-        duration = int(blink_speed * 1000)  # Convert seconds to milliseconds
+        # Save as GIF with looping, both frames share one palette
+        FlipbookWriter.writeAnimation([primary_image, blink_image], gif_filepath, duration=blink_speed, output_format=output_format, loop=0)
 
-        # Append the image with the centers aligned without resizing
+        return gif_filepath, image_size
 
-        # Save as GIF with looping
-        images[0].save(gif_filepath, save_all=True, append_images=images[1:], duration=duration, loop=0)
+    @staticmethod
+    def FITSDataToImage(data):
+        """
+        Convert FITS image data into a grayscale image, normalized from its minimum to its maximum.
 
-        # Remove the temporary images
-        os.remove(primary_layer_image_filepath)
-        os.remove(blink_layer_image_filepath)
+        Parameters
+        ----------
+        data : numpy.ndarray
+            2D FITS image data.
 
-        return gif_filepath, image_size
+        Returns
+        -------
+        image : PIL.Image.Image
+            The "L" mode image.
+        """
+
+        # Normalize the data to the range 0-255
+        data = np.nan_to_num(data)  # Convert NaNs to zero
+        data_min = np.min(data)
+        data_max = np.max(data)
+        data = (data - data_min) / (data_max - data_min) * 255
+        data = data.astype(np.uint8)
+
+        return Image.fromarray(data)
 
     @staticmethod
     def convertFITS(fits_filepath, output_directory=None, filename=None, format="PNG"):
@@ -830,23 +1508,16 @@ class LegacySurveyQuery:
         with fits.open(fits_filepath) as hdul:
             data = hdul[1].data
 
-        # Normalize the data to the range 0-255
-        data = np.nan_to_num(data)  # Convert NaNs to zero
-        data_min = np.min(data)
-        data_max = np.max(data)
-        data = (data - data_min) / (data_max - data_min) * 255
-        data = data.astype(np.uint8)
-
         # Convert to an image
-        image = Image.fromarray(data)
+        image = LegacySurveyQuery.FITSDataToImage(data)
 
         # Save the image as a JPG
         filepath = f"{output_directory}/{filename}"
-        image.save(filepath, format=format)
+        PostProcessing.saveImage(image, filepath, format=format)
 
         return filepath
 
-    def downloadModifiedLegacySurveyBlinkImages(self, output_directory=None, scale_factor=1.0, addGrid=False, gridCount=5, gridType = "Solid", gridColor = (0,0,0)):
+    def downloadModifiedLegacySurveyBlinkImages(self, output_directory=None, scale_factor=1.0, addGrid=False, gridCount=5, gridType = "Solid", gridColor = (0,0,0), incremental=False, materialize_scale=True):
         """
         Generates a set of modified blink image PNG files for the available set of data from the Legacy Survey API.
 
@@ -866,6 +1537,13 @@ class LegacySurveyQuery:
                 Intersection, and Dashed. Defaults to Solid.
             gridColor : tuple, optional
                 A 3 integer element tuple which represents the RGB values of the color
+            incremental : bool, optional
+                Keep the unmodified images in a "raw/<request key>" subdirectory of output_directory, keyed on the
+                query parameters, and on reruns, only download them if they are missing and only regenerate outputs whose
+                request or post-processing configuration changed. Defaults to False.
+            materialize_scale : bool, optional
+                If False, the scale factor is recorded as PNG metadata (see PostProcessing.getScaleFactor) instead of
+                writing upscaled PNG files. Defaults to True.
 
         Returns
         -------
@@ -884,11 +1562,29 @@ class LegacySurveyQuery:
         if (not os.path.exists(output_directory)):
             os.mkdir(output_directory)
 
-        flist, size_list = self.getBlinkImages(output_directory)
-
         functions = [PostProcessing.scaleImage, PostProcessing.applyGridToImage]
-        function_args = [(scale_factor,), (addGrid, gridCount, gridType, gridColor)]
-        PostProcessing.applyModifications(flist, functions, function_args)
+        function_args = [(scale_factor, False, materialize_scale), (addGrid, gridCount, gridType, gridColor)]
+
+        if (incremental):
+            request_key = PostProcessing.requestKey(dict(self.legacy_survey_parameters))
+            raw_directory = PostProcessing.getRawDirectory(output_directory, request_key)
+
+            raw_flist = [os.path.join(raw_directory, raw_filename) for raw_filename in self.getBlinkImageFilenames()]
+            if (all(os.path.exists(raw_file) for raw_file in raw_flist)):
+                size_list = []
+                for raw_file in raw_flist:
+                    with Image.open(raw_file) as img:
+                        size_list.append(img.size)
+            else:
+                raw_flist, size_list = self.getBlinkImages(raw_directory)
+
+            if (None in raw_flist):
+                return raw_flist, size_list
+
+            flist = PostProcessing.rebuildModifiedFiles(raw_flist, output_directory, functions, function_args, request_key)
+        else:
+            flist, size_list = self.getBlinkImages(output_directory)
+            PostProcessing.applyModifications(flist, functions, function_args)
 
         if(scale_factor != 1):
             for index, f in enumerate(flist):
@@ -898,28 +1594,232 @@ class LegacySurveyQuery:
 
         return flist, size_list
     
-    def dataExists(self):
+    @classmethod
+    def downloadCutouts(cls, ra_list, dec_list, output_directory=None, filenames=None, cutout_format="jpeg", max_workers=16, max_requests_per_host=8, progress_callback=None, **kwargs):
+        """
+        Download Legacy Survey cutouts for many positions which share the same options, such as the rows of a catalog.
+
+        Parameters
+        ----------
+        ra_list, dec_list : array_like
+            Right ascension and declination of each cutout, in degrees.
+        output_directory : str
+            The directory to save the cutouts.
+        filenames : list
+            The name of each cutout file. Defaults to the position and layer, with the extension of the cutout format.
+        cutout_format : str
+            "jpeg" or "fits".
+        max_workers : int
+            Maximum number of concurrent downloads, which is also the size of the connection pool.
+        max_requests_per_host : int
+            Maximum number of requests in flight to any one host, to be polite to the Legacy Survey servers.
+        progress_callback : callable
+            Called as progress_callback(completed_count, total_count) after each cutout is done.
+        **kwargs
+            Options shared by every cutout, validated once with the customParams rules. Positions are taken from
+            ra_list and dec_list, not from kwargs.
+
+        Returns
+        -------
+        cutout_filepaths : list
+            The filepath of each cutout in input order, or None for the positions without data or with a failed request.
+
+        Notes
+        -----
+        The shared options are validated once into a LegacySurveyQuerySpec, and the cutout URLs are rendered from its
+        precompiled template. The LegacySurveyQuery built per position with LegacySurveyQuerySpec.getQuery skips
+        validation, and is only used to consult and update the caches. Unless allow_empty is set, JPEG cutouts are
+        preceded by the status-only existence check of hasData, with its results shared through data_validity_cache.
+        Positions recorded in the negative cache (see setNegativeCache) are skipped without any request.
+        """
+
+        if(cutout_format not in ["jpeg", "fits"]):
+            raise ValueError(f"Invalid cutout format: {cutout_format}. The available formats are: jpeg, fits.")
+
+        if(len(ra_list) != len(dec_list)):
+            raise ValueError("There must be exactly one declination per right ascension.")
+
+        if(output_directory is None):
+            output_directory = os.getcwd()
+
+        if(not os.path.exists(output_directory)):
+            os.mkdir(output_directory)
+
+        # Validate the shared options once
+        query_spec = LegacySurveyQuerySpec(**kwargs)
+        shared_parameters = query_spec.parameters
+        extension = ".jpg" if cutout_format == "jpeg" else ".fits"
+
+        if(filenames is None):
+            filenames = ["RA" + str(ra) + "_DEC" + str(dec) + f"layer{shared_parameters['layer']}" + extension for ra, dec in zip(ra_list, dec_list)]
+
+        total_count = len(ra_list)
+        completed_count = 0
+        progress_lock = threading.Lock()
+        host_semaphores = {}
+
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        def politeGet(url, stream=False):
+            host = urllib.parse.urlsplit(url).netloc
+            with progress_lock:
+                if(host not in host_semaphores):
+                    host_semaphores[host] = threading.BoundedSemaphore(max_requests_per_host)
+            with host_semaphores[host]:
+                return session.get(url, stream=stream)
+
+        def downloadCutout(index):
+            nonlocal completed_count
+
+            ra, dec = float(ra_list[index]), float(dec_list[index])
+            fits_query_url = query_spec.getURL(ra, dec, "fits")
+
+            query = query_spec.getQuery(ra, dec)
+            check_data = cutout_format == "fits" or not shared_parameters["allow_empty"]
+
+            cutout_filepath = None
+            try:
+                if(check_data and query.isKnownEmpty()):
+                    response = None
+                elif(cutout_format == "fits"):
+                    response = politeGet(fits_query_url)
+                    query.recordFITSResponse(fits_query_url, response)
+                else:
+                    has_data = cls.getCachedDataValidity(fits_query_url) if check_data else True
+                    if(has_data is None):
+                        with politeGet(fits_query_url, stream=True) as fits_response:
+                            query.recordFITSResponse(fits_query_url, fits_response)
+                            has_data = fits_response.ok
+                    if(not has_data):
+                        response = None
+                    else:
+                        response = politeGet(query_spec.getURL(ra, dec, "jpeg"))
+
+                if(response is not None and response.ok):
+                    cutout_filepath = f"{output_directory}/{filenames[index]}"
+                    with open(cutout_filepath, "wb") as file:
+                        file.write(response.content)
+            except requests.exceptions.RequestException as e:
+                print("Exception of type " + str(type(e)) + " occurred in downloadCutouts: " + str(e))
+
+            if(progress_callback is not None):
+                with progress_lock:
+                    completed_count += 1
+                    progress_callback(completed_count, total_count)
+
+            return cutout_filepath
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                cutout_filepaths = list(executor.map(downloadCutout, range(total_count)))
+        finally:
+            session.close()
+
+        return cutout_filepaths
+
+    def dataExists(self, extra_layers=None):
         """
         Validate the query parameters by checking if the FITS cutout URL is valid and provides a response. If the blink parameter is set, it will also check if the blink layer has data.
-        In the case that one of the layers does not have data, the function will return False.
+        In the case that one of the layers does not have data, the function will return False. Only the response statuses are requested, and they are cached (see hasData).
+
+        Parameters
+        ----------
+        extra_layers : list
+            Additional layers which must also have data at this position.
         """
-        
-        query_url = self.getFITSCutoutURL()
-        response = requests.get(query_url)
 
-        if(response.ok):
-            if(self.legacy_survey_parameters["blink"] != False):
-                blink_parameters = self.input_parameters.copy()
-                blink_parameters["layer"], blink_parameters["blink"] = self.legacy_survey_parameters["blink"], self.legacy_survey_parameters["layer"]
-                blink_lsq = LegacySurveyQuery(**blink_parameters)
-                blink_url = blink_lsq.getFITSCutoutURL()
-                blink_response = requests.get(blink_url)
+        queries = self.getLayerQueries(extra_layers)
+
+        # Check every layer concurrently
+        with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+            return all(executor.map(LegacySurveyQuery.hasData, queries))
+
+
+class LegacySurveyQuerySpec:
+    """
+    Validated Legacy Survey parameters with a precompiled URL template, for rendering the URLs of many positions which
+    share the same options.
+
+    Parameters
+    ----------
+        **kwargs : dict
+            Legacy Survey parameters, validated once with the LegacySurveyQuery.customParams rules. The position given
+            here is only the default position of the spec.
 
-                if(not blink_response.ok):
-                    return False
+    Notes
+    -----
+        A spec only holds its parameters and its URL template, so it is cheap to keep one per batch of a large catalog.
+        Rendering a URL is a single str.format call on the template, without revalidating the parameters.
+    """
 
-        return response.ok
+    __slots__ = ("parameters", "url_template")
 
+    url_bases = MappingProxyType({
+        "viewer": "https://www.legacysurvey.org/viewer?",
+        "jpeg": "https://www.legacysurvey.org/viewer/jpeg-cutout?",
+        "fits": "https://www.legacysurvey.org/viewer/fits-cutout?",
+    })
 
+    # Placeholders which cannot appear in a rendered parameter value
+    ra_marker = "\x00ra\x00"
+    dec_marker = "\x00dec\x00"
 
+    def __init__(self, **kwargs):
+        self.parameters = MappingProxyType(LegacySurveyQuery.customParams(**kwargs))
+
+        template = LegacySurveyQuery.parametersToURL("", dict(self.parameters, ra=self.ra_marker, dec=self.dec_marker))
+        template = template.replace("{", "{{").replace("}", "}}")
+        self.url_template = template.replace(self.ra_marker, "{ra}").replace(self.dec_marker, "{dec}")
+
+    def getURL(self, ra=None, dec=None, url_type="jpeg"):
+        """
+        Render the URL of one position.
+
+        Parameters
+        ----------
+            ra, dec : float, optional
+                Position in degrees. Defaults to the position of the spec.
+            url_type : str, optional
+                "jpeg" or "fits" for a cutout, or "viewer". Defaults to "jpeg".
+
+        Returns
+        -------
+            url : str
+        """
+
+        if(url_type not in self.url_bases):
+            raise ValueError(f"Invalid URL type: {url_type}. The available URL types are: {list(self.url_bases.keys())}.")
+
+        if(ra is None):
+            ra = self.parameters["ra"]
+        if(dec is None):
+            dec = self.parameters["dec"]
+
+        return self.url_bases[url_type] + self.url_template.format(ra=ra, dec=dec)
+
+    def getURLs(self, ra_list, dec_list, url_type="jpeg"):
+        """
+        Render the URLs of many positions, see getURL.
+        """
+
+        url_base = self.url_bases[url_type]
+        url_template = self.url_template
+        return [url_base + url_template.format(ra=ra, dec=dec) for ra, dec in zip(ra_list, dec_list)]
+
+    def getQuery(self, ra=None, dec=None):
+        """
+        Get a full LegacySurveyQuery at one position, without validating the parameters again.
+        """
 
+        query = LegacySurveyQuery.__new__(LegacySurveyQuery)
+        query.legacy_survey_parameters = dict(self.parameters)
+        if(ra is not None):
+            query.legacy_survey_parameters["ra"] = ra
+        if(dec is not None):
+            query.legacy_survey_parameters["dec"] = dec
+        query.input_parameters = {key: value for key, value in query.legacy_survey_parameters.items() if key not in ["overlays", "mark", "poly"] and value is not False}
+        query.allow_empty_images = query.legacy_survey_parameters["allow_empty"]
+        return query
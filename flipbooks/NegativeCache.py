@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent cache of sky positions where a layer has no data.
+
+Positions outside the footprint of a layer always give invalid responses, so recording them lets reruns skip those
+requests instantly. Results are keyed by (layer, HEALPix cell), so nearby positions share one entry, and expire after a
+time to live so that footprint growth between data releases is eventually picked up.
+
+@author: Aaron Meisner, Noah Schapera, Austin Humphreys
+"""
+
+import os
+import time
+import sqlite3
+import threading
+
+import numpy as np
+
+from flipbooks import HEALPix
+
+class NegativeCache:
+
+    default_filepath = os.path.join(os.path.expanduser("~"), ".flipbooks", "negative_cache.sqlite")
+
+    def __init__(self, filepath=None, order=12, ttl=30 * 24 * 3600):
+        """
+        Open (or create) a negative cache.
+
+        Parameters
+        ----------
+            filepath : str, optional
+                SQLite database file. Defaults to ~/.flipbooks/negative_cache.sqlite.
+            order : int, optional
+                HEALPix order of the cells, about 52 arcseconds across at the default of 12. A whole cell is skipped once
+                one of its positions has no data, so the cells should be small compared to the footprint edges.
+            ttl : float, optional
+                Time to live of the entries in seconds. Defaults to 30 days.
+        """
+
+        if (filepath is None):
+            filepath = self.default_filepath
+
+        directory = os.path.dirname(filepath)
+        if (directory != "" and not os.path.exists(directory)):
+            os.makedirs(directory)
+
+        HEALPix.orderToNside(order)
+
+        self.filepath = filepath
+        self.order = order
+        self.ttl = ttl
+
+        # Queries are run from download threads, so one connection is shared behind a lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(filepath, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS negative_results (layer TEXT NOT NULL, healpix_order INTEGER NOT NULL, cell INTEGER NOT NULL, recorded REAL NOT NULL, PRIMARY KEY (layer, healpix_order, cell))")
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def getCells(self, ra, dec):
+        return np.atleast_1d(HEALPix.ang2pixNested(self.order, ra, dec))
+
+    def record(self, layer, ra, dec):
+        """
+        Record that a layer has no data at one or more positions.
+
+        Parameters
+        ----------
+            layer : str
+                Layer (or survey version) identifier.
+            ra, dec : float or array_like
+                Sky coordinates in degrees.
+        """
+
+        recorded = time.time()
+        rows = [(layer, self.order, int(cell), recorded) for cell in np.unique(self.getCells(ra, dec))]
+        with self.lock, self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO negative_results VALUES (?, ?, ?, ?)", rows)
+
+    def isEmpty(self, layer, ra, dec):
+        """
+        Check whether a layer is recorded as having no data at one or more positions.
+
+        Parameters
+        ----------
+            layer : str
+                Layer (or survey version) identifier.
+            ra, dec : float or array_like
+                Sky coordinates in degrees.
+
+        Returns
+        -------
+            is_empty : bool or numpy.ndarray
+                True where an unexpired entry covers the position, a bool for scalar positions.
+        """
+
+        cells = self.getCells(ra, dec)
+        unique_cells, inverse = np.unique(cells, return_inverse=True)
+        oldest_valid = time.time() - self.ttl
+
+        empty_cells = set()
+        # SQLite limits the number of parameters of one statement
+        for start in range(0, len(unique_cells), 500):
+            chunk = [int(cell) for cell in unique_cells[start:start + 500]]
+            placeholders = ",".join("?" * len(chunk))
+            with self.lock:
+                rows = self.connection.execute(f"SELECT cell FROM negative_results WHERE layer = ? AND healpix_order = ? AND recorded >= ? AND cell IN ({placeholders})", [layer, self.order, oldest_valid, *chunk]).fetchall()
+            empty_cells.update(row[0] for row in rows)
+
+        is_empty = np.isin(unique_cells, list(empty_cells))[inverse].reshape(cells.shape)
+
+        if (np.ndim(ra) == 0 and np.ndim(dec) == 0):
+            return bool(is_empty[0])
+        return is_empty
+
+    def forget(self, layer, ra, dec):
+        """
+        Remove the entries of a layer covering one or more positions.
+        """
+
+        rows = [(layer, self.order, int(cell)) for cell in np.unique(self.getCells(ra, dec))]
+        with self.lock, self.connection:
+            self.connection.executemany("DELETE FROM negative_results WHERE layer = ? AND healpix_order = ? AND cell = ?", rows)
+
+    def expire(self):
+        """
+        Delete the entries older than the time to live.
+        """
+
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM negative_results WHERE recorded < ?", (time.time() - self.ttl,))
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM negative_results")
@@ -9,9 +9,217 @@ Save state modifcations on Thurs Jun 1 16:27:00 2023
 @author: Noah Schapera, Austin Humphreys
 """
 
-from PIL import Image, ImageDraw
+from PIL import Image, ImageDraw, PngImagePlugin
 import multiprocessing as mp
 import os
+import json
+import shutil
+import hashlib
+import functools
+import atexit
+import time
+import threading
+from io import BytesIO
+
+import numpy as np
+
+manifest_filename = ".postprocessing_manifest.json"
+
+# Lazily started by getProcessingPool, None uses one worker per CPU
+processing_pool = None
+processing_pool_size = None
+processing_pool_lock = threading.Lock()
+
+# PNG encoding profiles applied by saveImage. "fast" trades bytes for CPU, "small" quantizes to a palette of at most 256
+# colors (lossy only if the image has more colors than that), and "lossless-compact" only uses a palette when it is exact.
+png_encoding_profiles = {
+    "default": {"palette": None, "save_kwargs": {}},
+    "fast": {"palette": None, "save_kwargs": {"compress_level": 1}},
+    "small": {"palette": "quantize", "save_kwargs": {"optimize": True}},
+    "lossless-compact": {"palette": "exact", "save_kwargs": {"optimize": True}},
+}
+png_encoding_profile = "default"
+
+def setPNGEncodingProfile(profile):
+    """
+    Select the PNG encoding profile used by every flipbooks image writer.
+
+    Parameters
+    ----------
+    profile : str
+        One of the keys of png_encoding_profiles.
+
+    Notes
+    -----
+    Changing the profile restarts the processing pool, so that its workers pick up the new profile.
+    """
+
+    global png_encoding_profile
+    if (profile not in png_encoding_profiles):
+        raise ValueError(f"Invalid PNG encoding profile: {profile}. The available profiles are: {list(png_encoding_profiles.keys())}.")
+
+    if (profile != png_encoding_profile):
+        png_encoding_profile = profile
+        shutdownProcessingPool()
+
+def toExactPalette(image):
+    """
+    Convert an RGB or opaque RGBA image into a palette image without changing any pixel, if it has at most 256 colors.
+
+    Returns
+    -------
+    palette_image : PIL.Image.Image or None
+        The "P" mode image, or None if the image has too many colors or an unsupported mode.
+    """
+
+    if (image.mode == "RGBA"):
+        if (image.getextrema()[3][0] != 255):
+            return None
+        image = image.convert("RGB")
+
+    if (image.mode != "RGB"):
+        return None
+
+    # getcolors rejects images with too many colors without a full pass in Python
+    colors = image.getcolors(256)
+    if (colors is None):
+        return None
+
+    palette = np.array([color for count, color in colors], dtype=np.uint32)
+    palette_keys = np.sort((palette[:, 0] << 16) | (palette[:, 1] << 8) | palette[:, 2])
+
+    image_data = np.asarray(image)
+    color_keys = (image_data[..., 0].astype(np.uint32) << 16) | (image_data[..., 1].astype(np.uint32) << 8) | image_data[..., 2]
+    palette_indices = np.searchsorted(palette_keys, color_keys).astype(np.uint8)
+
+    palette = np.stack(((palette_keys >> 16) & 255, (palette_keys >> 8) & 255, palette_keys & 255), axis=-1).astype(np.uint8)
+    palette_image = Image.fromarray(palette_indices)
+    palette_image.putpalette(palette.ravel().tolist())
+    return palette_image
+
+def encodeImage(image, profile=None):
+    """
+    Prepare an image for saving as a PNG with an encoding profile.
+
+    Parameters
+    ----------
+    image : PIL.Image.Image
+        Image to encode.
+    profile : str, optional
+        One of the keys of png_encoding_profiles. Defaults to the profile selected with setPNGEncodingProfile.
+
+    Returns
+    -------
+    encoded_image : PIL.Image.Image
+        The image to save, which may be a palette version of the input.
+    save_kwargs : dict
+        Keyword arguments for Image.save.
+    """
+
+    if (profile is None):
+        profile = png_encoding_profile
+
+    if (profile not in png_encoding_profiles):
+        raise ValueError(f"Invalid PNG encoding profile: {profile}. The available profiles are: {list(png_encoding_profiles.keys())}.")
+
+    palette_mode = png_encoding_profiles[profile]["palette"]
+    encoded_image = image
+    if (palette_mode is not None and image.mode in ("RGB", "RGBA")):
+        palette_image = toExactPalette(image)
+        if (palette_image is not None):
+            encoded_image = palette_image
+        elif (palette_mode == "quantize"):
+            quantize_method = Image.Quantize.FASTOCTREE if image.mode == "RGBA" else Image.Quantize.MEDIANCUT
+            encoded_image = image.quantize(256, method=quantize_method, dither=Image.Dither.NONE)
+
+    return encoded_image, dict(png_encoding_profiles[profile]["save_kwargs"])
+
+def saveImage(image, file_path, profile=None, **kwargs):
+    """
+    Save an image, applying the PNG encoding profile if it is saved as a PNG.
+
+    Parameters
+    ----------
+    image : PIL.Image.Image
+        Image to save.
+    file_path : str or file object
+        Destination.
+    profile : str, optional
+        One of the keys of png_encoding_profiles. Defaults to the profile selected with setPNGEncodingProfile.
+    kwargs : keyword arguments
+        Additional keyword arguments for Image.save, such as format or pnginfo.
+    """
+
+    image_format = kwargs.get("format")
+    if (image_format is None and isinstance(file_path, str)):
+        image_format = os.path.splitext(file_path)[1][1:]
+
+    if (image_format is None or image_format.lower() != "png"):
+        image.save(file_path, **kwargs)
+        return
+
+    encoded_image, save_kwargs = encodeImage(image, profile)
+    save_kwargs.update(kwargs)
+    encoded_image.save(file_path, **save_kwargs)
+
+def benchmarkPNGEncodingProfiles(frames, profiles=None, repeats=3, verbose=True):
+    """
+    Measure the encode time and size per frame of each PNG encoding profile.
+
+    Parameters
+    ----------
+    frames : list
+        Frames to encode, as file names, PIL images or uint8 arrays.
+    profiles : list of str, optional
+        Profiles to benchmark. Defaults to all of png_encoding_profiles.
+    repeats : int, optional
+        Number of times each frame is encoded, the fastest time is kept. Defaults to 3.
+    verbose : bool, optional
+        Print a table of the results. Defaults to True.
+
+    Returns
+    -------
+    results : dict
+        Dictionary mapping each profile to a dictionary with the mean "seconds_per_frame" and "bytes_per_frame".
+    """
+
+    if (profiles is None):
+        profiles = list(png_encoding_profiles.keys())
+
+    images = []
+    for frame in frames:
+        if (isinstance(frame, str)):
+            with Image.open(frame) as im:
+                images.append(im.convert("RGB") if im.mode == "P" else im.copy())
+        elif (isinstance(frame, Image.Image)):
+            images.append(frame)
+        else:
+            images.append(Image.fromarray(np.asarray(frame)))
+
+    results = {}
+    for profile in profiles:
+        total_seconds = 0
+        total_bytes = 0
+        for image in images:
+            best_seconds = None
+            for _ in range(repeats):
+                buffer = BytesIO()
+                start_time = time.perf_counter()
+                saveImage(image, buffer, profile=profile, format="PNG")
+                elapsed_seconds = time.perf_counter() - start_time
+                if (best_seconds is None or elapsed_seconds < best_seconds):
+                    best_seconds = elapsed_seconds
+            total_seconds += best_seconds
+            total_bytes += buffer.tell()
+
+        results[profile] = {"seconds_per_frame": total_seconds / len(images), "bytes_per_frame": total_bytes / len(images)}
+
+    if (verbose):
+        print(f"{'Profile':<18}{'ms/frame':>10}{'bytes/frame':>14}")
+        for profile in results:
+            print(f"{profile:<18}{results[profile]['seconds_per_frame'] * 1000:>10.2f}{results[profile]['bytes_per_frame']:>14.0f}")
+
+    return results
 
 #rescales pngs
 def rescale(file_path, scale_factor, allow_non_integer_scaling = False):
@@ -26,7 +234,104 @@ def rescale(file_path, scale_factor, allow_non_integer_scaling = False):
 
         rescaled_size = (int(width * scale_factor), int(height * scale_factor))
 
-        resizeImage(file_path, rescaled_size)
+        # Resize the already decoded image rather than reopening the file in resizeImage, integer factors repeat pixels
+        if(scale_factor == int(scale_factor) and scale_factor >= 1 and im.mode in upscale_modes):
+            resized_image = upscaleImage(im, int(scale_factor))
+        else:
+            resized_image = im.resize(rescaled_size, Image.Resampling.NEAREST)
+        saveImage(resized_image, file_path)
+
+# Image modes which upscaleImage round-trips through NumPy without loss
+upscale_modes = ("L", "LA", "RGB", "RGBA", "P")
+
+def upscaleArray(image_data, scale_factor):
+    """
+    Nearest-neighbour upscaling of in-memory frames by an integer factor, by pixel repetition.
+
+    Parameters
+    ----------
+        image_data : numpy.ndarray
+            A single (H, W) or (H, W, C) frame, or a batch of (N, H, W, C) frames.
+        scale_factor : int
+            Integer scaling factor.
+
+    Returns
+    -------
+        upscaled_image_data : numpy.ndarray
+            New array with the height and width multiplied by scale_factor.
+
+    Notes
+    -----
+        The repetition is expressed as a broadcast view, so the upscaled array is materialized with a single copy.
+    """
+
+    if(scale_factor != int(scale_factor) or scale_factor < 1):
+        raise ValueError("Scale factor must be a positive integer.")
+
+    scale_factor = int(scale_factor)
+    image_data = np.asarray(image_data)
+
+    if(image_data.ndim == 2):
+        return upscaleArray(image_data[..., None], scale_factor)[..., 0]
+    elif(image_data.ndim not in (3, 4)):
+        raise ValueError(f"Frames must have shape (H, W), (H, W, C) or (N, H, W, C), not {image_data.shape}.")
+
+    if(scale_factor == 1):
+        return image_data.copy()
+
+    *leading_shape, height, width, channels = image_data.shape
+    repeated_view = np.broadcast_to(image_data[..., :, None, :, None, :], (*leading_shape, height, scale_factor, width, scale_factor, channels))
+    return repeated_view.reshape(*leading_shape, height * scale_factor, width * scale_factor, channels)
+
+def upscaleImage(image, scale_factor):
+    """
+    Integer nearest-neighbour upscaling of an already decoded PIL image with upscaleArray, keeping its mode and palette.
+    """
+
+    upscaled_image = Image.fromarray(upscaleArray(np.asarray(image), scale_factor))
+    if(image.mode == "P"):
+        upscaled_image.putpalette(image.getpalette())
+    if("transparency" in image.info):
+        upscaled_image.info["transparency"] = image.info["transparency"]
+    return upscaled_image
+
+def recordScaleFactor(file_path, scale_factor):
+    """
+    Record a display scale factor in the metadata of a PNG file instead of upscaling its pixels.
+
+    Parameters
+    ----------
+        file_path : str
+            PNG file, which is rewritten with a "scale_factor" text chunk.
+        scale_factor : float
+            Factor by which the image should be enlarged when displayed, multiplied with any previously recorded factor.
+    """
+
+    with Image.open(file_path) as im:
+        im.load()
+        png_info = PngImagePlugin.PngInfo()
+        png_info.add_text("scale_factor", str(getScaleFactor(im) * scale_factor))
+        saveImage(im, file_path, pnginfo=png_info)
+
+def getScaleFactor(image):
+    """
+    Get the display scale factor recorded by recordScaleFactor, or 1.0 if there is none.
+
+    Parameters
+    ----------
+        image : str or PIL.Image.Image
+            PNG file or an opened image.
+
+    Returns
+    -------
+        scale_factor : float
+    """
+
+    if(isinstance(image, str)):
+        with Image.open(image) as im:
+            return getScaleFactor(im)
+
+    return float(image.info.get("scale_factor", 1.0))
 
 def resizeImage(file_path, size):
     """
@@ -50,9 +355,92 @@ def resizeImage(file_path, size):
     """
     with Image.open(file_path) as im:
         resized_image = im.resize(size, Image.Resampling.NEAREST)
-        resized_image.save(file_path)
+        saveImage(resized_image, file_path)
     return file_path
 
+@functools.lru_cache(maxsize=64)
+def getGridMask(width, height, grid_count=12, grid_type="Solid"):
+    """
+    Render the grid lines of an image size and grid configuration into a mask, once per configuration.
+
+    Parameters
+    ----------
+    width : int
+        Image width.
+    height : int
+        Image height.
+    grid_count : int, optional
+        The number of grid boxes to generate along each axis.
+    grid_type : str, optional
+        Solid, Intersection, or Dashed.
+
+    Returns
+    -------
+    mask : PIL.Image.Image
+        "L" mode mask which is 255 on the grid lines and 0 elsewhere.
+
+    Notes
+    -----
+    The mask is cached, so it must not be modified by the caller.
+    """
+
+    mask = Image.new("L", (width, height), 0)
+    draw = ImageDraw.Draw(mask)
+    fill = 255
+    grid_side_length = int((width - (grid_count + 1)) / (grid_count))
+    step_size = grid_side_length + 1
+    offset = int((width % ((grid_side_length * grid_count) + (grid_count+1))) / 2)
+    if(grid_type == "Solid"):
+        for x in range(0, width, step_size):
+            line = ((x + offset, 0), (x + offset, height))
+            draw.line(line, fill=fill)
+
+        for y in range(0, height, step_size):
+            line = ((0, y + offset), (width, y + offset))
+            draw.line(line, fill=fill)
+
+    elif(grid_type == "Intersection"):
+        for x in range(0, width+1, step_size):
+            for y in range(0, height+1, step_size):
+                cross_size = 10
+                intersection_coordinate = (x + offset, y + offset)
+                intersection_x, intersection_y = intersection_coordinate
+                horizontal_line = ((intersection_x - cross_size, intersection_y), (intersection_x + cross_size, intersection_y))
+                vertical_line = ((intersection_x, intersection_y - cross_size), (intersection_x, intersection_y + cross_size))
+                draw.line(horizontal_line, fill=fill)
+                draw.line(vertical_line, fill=fill)
+
+    elif(grid_type == "Dashed"):
+        reduced_width = width - (grid_count + 1)
+        dashes_per_grid_side = 5
+        dash_spacing = 20
+        dash_length = int((((reduced_width/grid_count)+2)-(dashes_per_grid_side-1)*dash_spacing)/dashes_per_grid_side)
+        for x in range(0, width, step_size):
+            for y in range(0, height, dash_length+dash_spacing):
+                line = ((x + offset, y + offset), (x + offset, y + offset + dash_length))
+                draw.line(line, fill=fill)
+
+        for y in range(0, height, step_size):
+            for x in range(0, width, dash_length+dash_spacing):
+                line = ((x + offset, y + offset), (x + offset + dash_length, y + offset))
+                draw.line(line, fill=fill)
+    else:
+        raise TypeError(f"Invalid Grid type: {grid_type}. Should be Solid, Intersection, or Dashed.")
+
+    del draw
+
+    return mask
+
+@functools.lru_cache(maxsize=64)
+def getGridMaskArray(width, height, grid_count=12, grid_type="Solid"):
+    """
+    Boolean array version of getGridMask, with shape (height, width). The array is cached and read-only.
+    """
+
+    mask_array = np.asarray(getGridMask(width, height, grid_count, grid_type)) > 0
+    mask_array.flags.writeable = False
+    return mask_array
+
 def applyGrid(file_path, grid_count = 12, grid_type = "Solid", color = (0,0,0)):
     """
 
@@ -70,53 +458,76 @@ def applyGrid(file_path, grid_count = 12, grid_type = "Solid", color = (0,0,0)):
     -------
     None.
 
+    Notes
+    -----
+    The grid is rendered once per (width, height, grid_count, grid_type) into a cached mask by getGridMask and
+    composited onto each image with a single paste.
+
     """
 
     with Image.open(file_path) as image:
-        draw = ImageDraw.Draw(image)
-        grid_side_length = int((image.width - (grid_count + 1)) / (grid_count))
-        step_size = grid_side_length + 1
-        offset = int((image.width % ((grid_side_length * grid_count) + (grid_count+1))) / 2)
-        if(grid_type == "Solid"):
-            for x in range(0, image.width, step_size):
-                line = ((x + offset, 0), (x + offset, image.height))
-                draw.line(line, fill=color)
-
-            for y in range(0, image.height, step_size):
-                line = ((0, y + offset), (image.width, y + offset))
-                draw.line(line, fill=color)
-
-        elif(grid_type == "Intersection"):
-            for x in range(0, image.width+1, step_size):
-                for y in range(0, image.height+1, step_size):
-                    cross_size = 10
-                    intersection_coordinate = (x + offset, y + offset)
-                    intersection_x, intersection_y = intersection_coordinate
-                    horizontal_line = ((intersection_x - cross_size, intersection_y), (intersection_x + cross_size, intersection_y))
-                    vertical_line = ((intersection_x, intersection_y - cross_size), (intersection_x, intersection_y + cross_size))
-                    draw.line(horizontal_line, fill=color)
-                    draw.line(vertical_line, fill=color)
-
-        elif(grid_type == "Dashed"):
-            reduced_width = image.width - (grid_count + 1)
-            dashes_per_grid_side = 5
-            dash_spacing = 20
-            dash_length = int((((reduced_width/grid_count)+2)-(dashes_per_grid_side-1)*dash_spacing)/dashes_per_grid_side)
-            for x in range(0, image.width, step_size):
-                for y in range(0, image.height, dash_length+dash_spacing):
-                    line = ((x + offset, y + offset), (x + offset, y + offset + dash_length))
-                    draw.line(line, fill=color)
-
-            for y in range(0, image.height, step_size):
-                for x in range(0, image.width, dash_length+dash_spacing):
-                    line = ((x + offset, y + offset), (x + offset + dash_length, y + offset))
-                    draw.line(line, fill=color)
-        else:
-            raise TypeError(f"Invalid Grid type: {grid_type}. Should be Solid, Intersection, or Dashed.")
+        image.load()
+        mask = getGridMask(image.width, image.height, grid_count, grid_type)
+
+        if(image.mode == "P" and isinstance(color, (tuple, list))):
+            color = image.palette.getcolor(tuple(color), image)
+
+        image.paste(color, mask=mask)
+
+        saveImage(image, file_path)
+
+def applyGridToArray(image_data, grid_count = 12, grid_type = "Solid", color = (0,0,0)):
+    """
+    Add a grid to in-memory frames.
+
+    Parameters
+    ----------
+    image_data : numpy.ndarray
+        A single (H, W) or (H, W, C) frame, or a batch of (N, H, W, C) frames, modified in place. C is 1 (L), 2 (LA),
+        3 (RGB) or 4 (RGBA).
+    grid_count : int, optional
+        The number of grid boxes to generate along each axis.
+    grid_type : str, optional
+        Solid, Intersection, or Dashed.
+    color : tuple or int, optional
+        RGB (or RGBA) color of the grid, or a gray level. It is converted to the channels of the frames like PIL
+        converts colors, and the grid is opaque unless an alpha value is given.
+
+    Returns
+    -------
+    image_data : numpy.ndarray
+        The same array, with the grid applied.
+    """
+
+    if (image_data.ndim == 2):
+        applyGridToArray(image_data[..., None], grid_count, grid_type, color)
+        return image_data
 
-        del draw
+    height, width = image_data.shape[-3:-1]
+    mask = getGridMaskArray(width, height, grid_count, grid_type)
+    image_data[..., mask, :] = getChannelColor(color, image_data.shape[-1])
+    return image_data
 
-        image.save(file_path)
+def getChannelColor(color, channel_count):
+    """
+    Convert a grid color to the channel values of L, LA, RGB or RGBA frames.
+    """
+
+    color = tuple(np.atleast_1d(color).tolist())
+    if (len(color) in [1, 2]):
+        rgb, alpha = color[:1] * 3, color[1:]
+    else:
+        rgb, alpha = color[:3], color[3:]
+    alpha = alpha if len(alpha) > 0 else (255,)
+
+    if (channel_count in [1, 2]):
+        # ITU-R 601-2 luma, as used by PIL for RGB to L conversions
+        gray = int(round(rgb[0] * 299 / 1000 + rgb[1] * 587 / 1000 + rgb[2] * 114 / 1000))
+        return np.array(((gray,) + alpha)[:channel_count], dtype=np.uint8)
+    if (channel_count in [3, 4]):
+        return np.array((rgb + alpha)[:channel_count], dtype=np.uint8)
+
+    raise ValueError(f"Frames must have 1, 2, 3 or 4 channels, not {channel_count}.")
 
 def earlyTerminationProtocol(flist):
     print("Early termination protocol initiated. Deleting unfinished files.")
@@ -124,6 +535,41 @@ def earlyTerminationProtocol(flist):
         if (os.path.exists(f)):
             os.remove(f)
 
+def getProcessingPool():
+    """
+    Get the module-level processing pool, starting it on first use.
+
+    Returns
+    -------
+    pool : multiprocessing.pool.Pool
+        Worker pool which is reused by every applyModifications call until shutdownProcessingPool is called.
+
+    Notes
+    -----
+    Per-process caches, like the grid masks of getGridMask, persist in the workers between calls.
+    """
+
+    global processing_pool
+    # Download threads can request the pool concurrently, only one of them may start it
+    with processing_pool_lock:
+        if (processing_pool is None):
+            processing_pool = mp.Pool(processing_pool_size, initializer=setPNGEncodingProfile, initargs=(png_encoding_profile,))
+        return processing_pool
+
+def shutdownProcessingPool():
+    """
+    Close the module-level processing pool and wait for its workers to exit. A new pool is started on the next use.
+    """
+
+    global processing_pool
+    with processing_pool_lock:
+        if (processing_pool is not None):
+            processing_pool.close()
+            processing_pool.join()
+            processing_pool = None
+
+atexit.register(shutdownProcessingPool)
+
 def applyModificationFunctions(f, functions, function_args):
 
     for i in range(len(functions)):
@@ -131,31 +577,198 @@ def applyModificationFunctions(f, functions, function_args):
             functions[i](f, *function_args[i])
         except Exception as e:
             print("Exception of type " + str(type(e)) + f" occurred in function '{functions[i].__name__}': " + str(e))
-            return
+            return e
+
+    return None
+
+def applyModificationFunctionsToChunk(chunk, functions, function_args):
+    return [(f, applyModificationFunctions(f, functions, function_args)) for f in chunk]
+
+def applyModifications(flist, functions, function_args, chunksize=None):
+    """
+    Apply a list of post-processing functions to every file using the module-level processing pool.
+
+    Parameters
+    ----------
+    flist : list of str
+        Files to modify in place.
+    functions : list
+        Post-processing functions, each called as function(f, *args).
+    function_args : list of tuple
+        Arguments of each post-processing function.
+    chunksize : int, optional
+        Number of files sent to a worker at once. Defaults to splitting flist into about four chunks per worker.
+
+    Returns
+    -------
+    results : dict
+        Dictionary mapping each file to the exception raised while modifying it, or None if it succeeded.
+
+    Notes
+    -----
+    The function list is sent once per chunk instead of once per file.
+    """
 
-def applyModifications(flist, functions, function_args):
     for f in flist:
         if not os.path.exists(f):
             print(f"File {f} does not exist. Exiting.")
-            return
+            return {}
+
+    if (len(flist) == 0):
+        return {}
 
     try:
-        pool = mp.Pool()
-        file_processes = [pool.apply_async(applyModificationFunctions, args=(f, functions, function_args)) for f in flist]
-        pool.close()
-        pool.join()
+        pool = getProcessingPool()
+        if (chunksize is None):
+            worker_count = processing_pool_size or os.cpu_count() or 1
+            chunksize = max(1, -(-len(flist) // (4 * worker_count)))
+
+        chunks = [flist[i:i + chunksize] for i in range(0, len(flist), chunksize)]
+        chunk_results = pool.starmap(applyModificationFunctionsToChunk, [(chunk, functions, function_args) for chunk in chunks])
     except Exception as e:
         print("Exception of type " + str(type(e)) + " occurred in applyModifications: " + str(e))
         earlyTerminationProtocol(flist)
+        return {f: e for f in flist}
+
+    results = {}
+    for chunk_result in chunk_results:
+        results.update(chunk_result)
+
+    return results
 
 # Post-processing functions to be used in the applyModifications function
-def scaleImage(f, scale_factor, allow_non_integer_scaling=False):
+def scaleImage(f, scale_factor, allow_non_integer_scaling=False, materialize=True):
     if(scale_factor != 1 and scale_factor > 0):
-        rescale(f, scale_factor, allow_non_integer_scaling)
+        if(materialize):
+            rescale(f, scale_factor, allow_non_integer_scaling)
+        else:
+            recordScaleFactor(f, scale_factor)
 
 def applyGridToImage(f, addGrid, gridCount, gridType, gridColor):
     if(addGrid):
         applyGrid(f, gridCount, gridType, gridColor)
 
+def postProcessingConfigHash(functions, function_args, source_key=None):
+    """
+    Hash a post-processing configuration, so that outputs made with a different configuration can be detected.
+
+    Parameters
+    ----------
+    functions : list
+        Post-processing functions, as passed to applyModifications.
+    function_args : list of tuple
+        Arguments of each post-processing function.
+    source_key : str, optional
+        Identifier of the raw frames the outputs are made from, such as requestKey, so that outputs of another request
+        with the same file names are detected as well.
+
+    Returns
+    -------
+    config_hash : str
+        Hex digest of the configuration.
+    """
+
+    config = [[functions[i].__module__, functions[i].__name__, list(function_args[i])] for i in range(len(functions))]
+    if (source_key is not None):
+        config.append(source_key)
+    return hashlib.sha256(json.dumps(config, default=str).encode()).hexdigest()
+
+def requestKey(request):
+    """
+    Short hash identifying a request, from its parameters or URLs.
+
+    Parameters
+    ----------
+    request : dict or list
+        JSON serializable request parameters or URLs.
+
+    Returns
+    -------
+    request_key : str
+        First 16 hex digits of the SHA-256 digest of the request.
+    """
+
+    return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def getRawDirectory(output_directory, request_key):
+    """
+    Get (and create) the directory of the pristine raw frames of one request, raw/<request_key> in output_directory.
+
+    Keying the directory on the request means that raw frames downloaded for other parameters, which can share the same
+    file names, are never reused.
+    """
+
+    raw_directory = os.path.join(output_directory, "raw", request_key)
+    os.makedirs(raw_directory, exist_ok=True)
+    return raw_directory
+
+def loadManifest(output_directory):
+    manifest_path = os.path.join(output_directory, manifest_filename)
+    if (not os.path.exists(manifest_path)):
+        return {}
+
+    try:
+        with open(manifest_path) as manifest_file:
+            return json.load(manifest_file)
+    except json.JSONDecodeError:
+        print(f"Invalid post-processing manifest {manifest_path}, all outputs will be rebuilt.")
+        return {}
+
+def saveManifest(output_directory, manifest):
+    manifest_path = os.path.join(output_directory, manifest_filename)
+    with open(manifest_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+
+def rebuildModifiedFiles(raw_flist, output_directory, functions, function_args, source_key=None):
+    """
+    Regenerate only the stale post-processed outputs from their pristine raw copies.
+
+    Parameters
+    ----------
+    raw_flist : list of str
+        Unmodified frames, which are never overwritten.
+    output_directory : str
+        Directory of the post-processed outputs, which get the same file names as the raw frames.
+    functions : list
+        Post-processing functions, as passed to applyModifications.
+    function_args : list of tuple
+        Arguments of each post-processing function.
+    source_key : str, optional
+        Identifier of the request the raw frames come from, see postProcessingConfigHash.
+
+    Returns
+    -------
+    flist : list of str
+        Post-processed file names, in the order of raw_flist.
+
+    Notes
+    -----
+    An output is stale if it is missing or if the configuration hash recorded for it in the output directory's manifest
+    differs from the hash of the current configuration and source.
+    """
+
+    config_hash = postProcessingConfigHash(functions, function_args, source_key)
+    manifest = loadManifest(output_directory)
+
+    flist = []
+    stale_flist = []
+    for raw_file in raw_flist:
+        fname = os.path.basename(raw_file)
+        output_file = os.path.join(output_directory, fname)
+        flist.append(output_file)
+
+        if (manifest.get(fname) != config_hash or not os.path.exists(output_file)):
+            shutil.copyfile(raw_file, output_file)
+            stale_flist.append(output_file)
+
+    if (len(stale_flist) > 0):
+        results = applyModifications(stale_flist, functions, function_args)
 
+        for output_file in stale_flist:
+            if (output_file in results and results[output_file] is None):
+                manifest[os.path.basename(output_file)] = config_hash
+            else:
+                manifest.pop(os.path.basename(output_file), None)
+        saveManifest(output_directory, manifest)
 
+    return flist
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Local injection of synthetic moving sources into unWISE epoch cutouts.
+
+This mirrors the WiseView synth_a_* / synth_b_* parameters without a round trip to the WiseView service, and is vectorized
+across many synthetic parameter sets at once so injection-recovery tests can be run at NumPy speed.
+
+@author: Aaron Meisner, Noah Schapera, Austin Humphreys
+"""
+
+import numpy as np
+
+unWISE_pixel_scale = 2.75
+
+# unWISE coadds are in Vega nanomaggies
+unWISE_zero_point = 22.5
+
+# Approximate FWHM of the WISE PSF in arcseconds
+psf_fwhm = {1: 6.1, 2: 6.4}
+
+days_per_year = 365.25
+mas_per_degree = 3.6e6
+
+def magnitudeToFlux(magnitude, zero_point=unWISE_zero_point):
+    """
+    Convert Vega magnitudes into unWISE image flux units.
+
+    Parameters
+    ----------
+        magnitude : float or array_like
+            Vega magnitude.
+        zero_point : float, optional
+            Magnitude zero point of the image. Defaults to 22.5, the unWISE zero point.
+
+    Returns
+    -------
+        flux : numpy.ndarray
+            Total flux in image units.
+    """
+
+    return 10 ** (-0.4 * (np.asarray(magnitude, dtype=np.float64) - zero_point))
+
+def skyToPixel(ra, dec, crpix1, crpix2, crval1, crval2, pixel_scale=unWISE_pixel_scale):
+    """
+    Project sky coordinates onto zero-indexed pixel coordinates of a north-up, east-left gnomonic (TAN) cutout.
+
+    Parameters
+    ----------
+        ra, dec : float or array_like
+            Sky coordinates in degrees.
+        crpix1, crpix2 : float or array_like
+            One-indexed reference pixel, as given by the FITS header or the WiseView metadata.
+        crval1, crval2 : float or array_like
+            Sky coordinates of the reference pixel in degrees.
+        pixel_scale : float, optional
+            Arcseconds per pixel. Defaults to the unWISE pixel scale.
+
+    Returns
+    -------
+        x, y : numpy.ndarray
+            Zero-indexed column and row coordinates, broadcast together from the inputs.
+    """
+
+    ra = np.radians(ra)
+    dec = np.radians(dec)
+    ra0 = np.radians(crval1)
+    dec0 = np.radians(crval2)
+
+    cos_c = np.sin(dec0) * np.sin(dec) + np.cos(dec0) * np.cos(dec) * np.cos(ra - ra0)
+    xi = np.cos(dec) * np.sin(ra - ra0) / cos_c
+    eta = (np.cos(dec0) * np.sin(dec) - np.sin(dec0) * np.cos(dec) * np.cos(ra - ra0)) / cos_c
+
+    pixels_per_radian = np.degrees(1) * 3600 / pixel_scale
+    x = (np.asarray(crpix1) - 1) - xi * pixels_per_radian
+    y = (np.asarray(crpix2) - 1) + eta * pixels_per_radian
+
+    return x, y
+
+def sourcePositions(mjds, ra, dec, pmra=0, pmdec=0, reference_mjd=None):
+    """
+    Sky positions of moving sources at each epoch.
+
+    Parameters
+    ----------
+        mjds : array_like
+            MJD of each epoch, with shape (N,).
+        ra, dec : float or array_like
+            Position of each source at reference_mjd in degrees, scalar or shape (K,).
+        pmra, pmdec : float or array_like, optional
+            Proper motion in mas/yr, with pmra including the cos(dec) factor, scalar or shape (K,).
+        reference_mjd : float or array_like, optional
+            MJD at which each source is at (ra, dec), scalar or shape (K,). Defaults to the first MJD.
+
+    Returns
+    -------
+        ra_t, dec_t : numpy.ndarray
+            Positions with shape (K, N) in degrees.
+    """
+
+    mjds = np.asarray(mjds, dtype=np.float64)
+    if (reference_mjd is None):
+        reference_mjd = mjds[0]
+
+    ra, dec, pmra, pmdec, reference_mjd = [np.atleast_1d(np.asarray(value, dtype=np.float64)) for value in (ra, dec, pmra, pmdec, reference_mjd)]
+    ra, dec, pmra, pmdec, reference_mjd = np.broadcast_arrays(ra, dec, pmra, pmdec, reference_mjd)
+
+    years = (mjds[None, :] - reference_mjd[:, None]) / days_per_year
+    dec_t = dec[:, None] + pmdec[:, None] * years / mas_per_degree
+    ra_t = ra[:, None] + pmra[:, None] * years / (mas_per_degree * np.cos(np.radians(dec[:, None])))
+
+    return ra_t, dec_t
+
+def gaussianProfiles(centers, length, sigma):
+    """
+    Normalized one-dimensional Gaussian profiles sampled at the pixel centers.
+
+    Parameters
+    ----------
+        centers : numpy.ndarray
+            Profile centers in pixels, any shape.
+        length : int
+            Number of pixels along the axis.
+        sigma : float
+            Gaussian standard deviation in pixels.
+
+    Returns
+    -------
+        profiles : numpy.ndarray
+            Profiles with shape (*centers.shape, length), each summing to one over an infinite axis.
+    """
+
+    pixels = np.arange(length, dtype=np.float64)
+    offsets = pixels - centers[..., None]
+    return np.exp(-0.5 * (offsets / sigma) ** 2) / (np.sqrt(2 * np.pi) * sigma)
+
+def injectSources(stack, mjds, crpix1, crpix2, crval1, crval2, ra, dec, magnitude, pmra=0, pmdec=0, reference_mjd=None, band=2, pixel_scale=unWISE_pixel_scale, return_model=False):
+    """
+    Inject PSF-modeled moving sources into a stack of epoch cutouts, one synthetic parameter set at a time.
+
+    Parameters
+    ----------
+        stack : array_like
+            Epoch cutouts of a single band with shape (N, H, W), in FITS orientation (row 0 is the southern edge).
+        mjds : array_like
+            MJD of each epoch, with shape (N,).
+        crpix1, crpix2, crval1, crval2 : float or array_like
+            WCS reference pixel and coordinates, scalar or one value per epoch with shape (N,).
+        ra, dec : float or array_like
+            Position of each synthetic source at reference_mjd in degrees, scalar or shape (K,).
+        magnitude : float or array_like
+            Vega magnitude of each synthetic source in this band, scalar or shape (K,).
+        pmra, pmdec : float or array_like, optional
+            Proper motion of each synthetic source in mas/yr, scalar or shape (K,).
+        reference_mjd : float or array_like, optional
+            MJD of each synthetic source position, scalar or shape (K,). Defaults to the first MJD.
+        band : int, optional
+            WISE band of the stack, 1 or 2, which sets the PSF width. Defaults to 2.
+        pixel_scale : float, optional
+            Arcseconds per pixel. Defaults to the unWISE pixel scale.
+        return_model : bool, optional
+            Return only the injected source model rather than the stack plus the model. Defaults to False.
+
+    Returns
+    -------
+        injected_stack : numpy.ndarray
+            Array of shape (K, N, H, W) with one injected copy of the stack per synthetic parameter set.
+
+    Notes
+    -----
+        The PSF is approximated by a circular Gaussian with the band's FWHM. The model is built from separable
+        one-dimensional profiles, so its cost is dominated by the final (K, N, H, W) outer product.
+    """
+
+    if (band not in psf_fwhm):
+        raise ValueError(f"Invalid band: {band}. The available bands are: {list(psf_fwhm.keys())}.")
+
+    epoch_stack = np.asarray(stack, dtype=np.float64)
+    if (epoch_stack.ndim != 3):
+        raise ValueError(f"The epoch stack must have shape (N, H, W), not {epoch_stack.shape}.")
+
+    epoch_count, height, width = epoch_stack.shape
+    mjds = np.asarray(mjds, dtype=np.float64)
+    if (mjds.shape != (epoch_count,)):
+        raise ValueError("There must be exactly one MJD per epoch.")
+
+    ra_t, dec_t = sourcePositions(mjds, ra, dec, pmra, pmdec, reference_mjd)
+    x, y = skyToPixel(ra_t, dec_t, crpix1, crpix2, crval1, crval2, pixel_scale)
+
+    # The magnitudes broadcast with the positions, so a magnitude sweep at a fixed position gives one set per magnitude
+    flux = np.atleast_1d(magnitudeToFlux(magnitude))
+    source_count = np.broadcast_shapes(flux.shape, ra_t.shape[:1])[0]
+    flux = np.broadcast_to(flux, (source_count,))
+    x = np.broadcast_to(x, (source_count, epoch_count))
+    y = np.broadcast_to(y, (source_count, epoch_count))
+    sigma = psf_fwhm[band] / (2 * np.sqrt(2 * np.log(2))) / pixel_scale
+
+    x_profiles = gaussianProfiles(x, width, sigma)
+    y_profiles = gaussianProfiles(y, height, sigma)
+
+    model = np.einsum("k,kny,knx->knyx", flux, y_profiles, x_profiles)
+
+    if (return_model):
+        return model
+
+    model += epoch_stack[None]
+    return model
@@ -6,11 +6,17 @@ Multiprocessing features created on Fri Jun 10 14:53:00 2022
 
 import os
 import time
+import asyncio
+import itertools
+import threading
+import collections
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
 import multiprocessing as mp
 from PIL import Image
-from flipbooks import PostProcessing
+from flipbooks import PostProcessing, SyntheticInjection, FlipbookWriter, FlipbookBundle, FlipbookFrame
 
 unWISE_pixel_scale = 2.75
 
@@ -19,6 +25,10 @@ class WiseViewQuery:
     png_anim = "https://vjxontvb73.execute-api.us-west-2.amazonaws.com/png-animation"
     amnh_base_url = "https://amnh-citsci-public.s3-us-west-2.amazonaws.com/"
     field_name_format = 'field-RA_{ra}-DEC_{dec}-DIFF_{diff}-INDEX_{index}.png'
+    synthetic_response_cache = collections.OrderedDict()
+    synthetic_response_cache_size = 256
+    synthetic_response_cache_lock = threading.Lock()
+    synthetic_retry_count = 2
 
     def __init__(self, **kwargs):
         self.wise_view_parameters = self.customParams(**kwargs)
@@ -125,13 +135,15 @@ class WiseViewQuery:
 
         return params
 
-    def generateSyntheticObject(self,**kwargs):
+    def fillSyntheticParameters(self, params, **kwargs):
         """
-        Sets the synth parameters in the current WiseView parameters dictionary and requests the corresponding JSON
-        again. If parameters are left as empty, they will be set to some pre-defined default values.
+        Sets the synth parameters in a WiseView parameters dictionary. If parameters are left as empty, they will be set
+        to some pre-defined default values based on the current WiseView response.
 
         Parameters
         ----------
+            params : dict
+                WiseView API query parameters to modify in place.
             kwargs : keyword arguments
                 Keyword arguments which are a part of the synth parameters in default_parameters, otherwise it will
                 raise an error. Even if the keyword argument is given in uppercase, it will still work.
@@ -142,55 +154,290 @@ class WiseViewQuery:
                 synth_x_w1 = 99.0
                 synth_x_w2 = 13.0
                 synth_x_mjd = mjd of the first frame
-        Notes
-        -----
 
+        Returns
+        -------
+            params : dict
+                The modified WiseView API query parameters.
         """
 
         a_keys = ["synth_a_sub", "synth_a_ra", "synth_a_dec", "synth_a_w1", "synth_a_w2", "synth_a_pmra", "synth_a_pmdec", "synth_a_mjd"]
         b_keys = ["synth_b_sub", "synth_b_ra", "synth_b_dec", "synth_b_w1", "synth_b_w2", "synth_b_pmra", "synth_b_pmdec", "synth_b_mjd"]
         valid_keys = [*a_keys, *b_keys]
-        self.wise_view_parameters["synth_a"] = 1
+        params["synth_a"] = 1
         for key in kwargs:
             if (key.lower() in valid_keys):
                 if(key.lower() in a_keys):
-                    self.wise_view_parameters[key.lower()] = kwargs[key]
+                    params[key.lower()] = kwargs[key]
                 elif(key.lower() in b_keys):
-                    self.wise_view_parameters["synth_b"] = 1
-                    self.wise_view_parameters[key.lower()] = kwargs[key]
+                    params["synth_b"] = 1
+                    params[key.lower()] = kwargs[key]
             else:
                 raise KeyError(f"The following key is not a valid parameter: {key}. The available parameters are: {valid_keys}.")
 
-        if(self.wise_view_parameters["synth_a"] == 1):
-            if(self.wise_view_parameters["synth_a_ra"] == ""):
-                self.wise_view_parameters["synth_a_ra"] = self.wise_view_parameters["ra"]
-            if(self.wise_view_parameters["synth_a_dec"] == ""):
-                self.wise_view_parameters["synth_a_dec"] = self.wise_view_parameters["dec"]
-            if (self.wise_view_parameters["synth_a_w1"] == ""):
-                self.wise_view_parameters["synth_a_w1"] = 99.0
-            if (self.wise_view_parameters["synth_a_w2"] == ""):
-                self.wise_view_parameters["synth_a_w2"] = 13.0
-            if(self.wise_view_parameters["synth_a_mjd"] == ""):
-                self.wise_view_parameters["synth_a_mjd"] = self.JSONResponse["all_mjds"][0]
-
-        if(self.wise_view_parameters["synth_b"] == 1):
-            if (self.wise_view_parameters["synth_b_ra"] == ""):
-                self.wise_view_parameters["synth_b_ra"] = self.wise_view_parameters["ra"]
-            if (self.wise_view_parameters["synth_b_dec"] == ""):
-                self.wise_view_parameters["synth_b_dec"] = self.wise_view_parameters["dec"]
-            if (self.wise_view_parameters["synth_b_w1"] == ""):
-                self.wise_view_parameters["synth_b_w1"] = 99.0
-            if (self.wise_view_parameters["synth_b_w2"] == ""):
-                self.wise_view_parameters["synth_b_w2"] = 13.0
-            if (self.wise_view_parameters["synth_b_mjd"] == ""):
-                self.wise_view_parameters["synth_b_mjd"] = self.JSONResponse["all_mjds"][0]
+        if(params["synth_a"] == 1):
+            if(params["synth_a_ra"] == ""):
+                params["synth_a_ra"] = params["ra"]
+            if(params["synth_a_dec"] == ""):
+                params["synth_a_dec"] = params["dec"]
+            if (params["synth_a_w1"] == ""):
+                params["synth_a_w1"] = 99.0
+            if (params["synth_a_w2"] == ""):
+                params["synth_a_w2"] = 13.0
+            if(params["synth_a_mjd"] == ""):
+                params["synth_a_mjd"] = self.JSONResponse["all_mjds"][0]
+
+        if(params["synth_b"] == 1):
+            if (params["synth_b_ra"] == ""):
+                params["synth_b_ra"] = params["ra"]
+            if (params["synth_b_dec"] == ""):
+                params["synth_b_dec"] = params["dec"]
+            if (params["synth_b_w1"] == ""):
+                params["synth_b_w1"] = 99.0
+            if (params["synth_b_w2"] == ""):
+                params["synth_b_w2"] = 13.0
+            if (params["synth_b_mjd"] == ""):
+                params["synth_b_mjd"] = self.JSONResponse["all_mjds"][0]
+
+        return params
 
+    def generateSyntheticObject(self,**kwargs):
+        """
+        Sets the synth parameters in the current WiseView parameters dictionary and requests the corresponding JSON
+        again. If parameters are left as empty, they will be set to some pre-defined default values.
+
+        Parameters
+        ----------
+            kwargs : keyword arguments
+                Keyword arguments which are a part of the synth parameters in default_parameters, otherwise it will
+                raise an error. Even if the keyword argument is given in uppercase, it will still work.
+                Defaults:
+                synth_x_sub = 0
+                synth_x_ra = current RA
+                synth_x_dec = current DEC
+                synth_x_w1 = 99.0
+                synth_x_w2 = 13.0
+                synth_x_mjd = mjd of the first frame
+        Notes
+        -----
+
+        """
+
+        self.fillSyntheticParameters(self.wise_view_parameters, **kwargs)
         self.JSONResponse = self.getJSONResponse()
 
-    def getResponse(self, delay=0):
+    @staticmethod
+    def expandParameterGrid(parameter_grid):
+        """
+        Expand a grid of synthetic parameters into a list of keyword argument dictionaries.
+
+        Parameters
+        ----------
+            parameter_grid : dict or list
+                Either a list of dictionaries of synth parameters, or a dictionary mapping each synth parameter to a list
+                of values, in which case every combination of values is used.
+
+        Returns
+        -------
+            parameter_sets : list of dict
+                One dictionary of synth parameters per injected rendering.
+        """
+
+        if (isinstance(parameter_grid, dict)):
+            keys = list(parameter_grid.keys())
+            value_lists = [parameter_grid[key] if isinstance(parameter_grid[key], (list, tuple)) else [parameter_grid[key]] for key in keys]
+            return [dict(zip(keys, values)) for values in itertools.product(*value_lists)]
+
+        return [dict(parameter_set) for parameter_set in parameter_grid]
+
+    def runSyntheticCampaign(self, parameter_grid, output_directory=None, max_workers=8):
+        """
+        Request WiseView renderings for a grid of synthetic objects at the current target.
+
+        Parameters
+        ----------
+            parameter_grid : dict or list
+                Grid of synth parameters, see expandParameterGrid.
+            output_directory : str, optional
+                If given, the frames of each parameter set are written as PNGs to a synth_<index> subdirectory. Otherwise
+                the PNG bytes are returned.
+            max_workers : int, optional
+                Maximum number of concurrent requests. Defaults to 8.
+
+        Returns
+        -------
+            campaign : list of dict
+                One dictionary per parameter set, with the keys "parameters" (the synth keyword arguments), "urls" (the
+                frame URLs), "frames" (PNG bytes, or file names if output_directory was given) and "error" (None, or the
+                reason why the rendering or its frames could not be fetched, in which case "frames" is empty), in grid
+                order.
+
+        Notes
+        -----
+            The current response is used as the baseline for the synth defaults, so only the injected renderings are
+            requested. Each parameter set starts from the target parameters without any synth object, so the synth
+            parameters of generateSyntheticObject calls do not carry over. Successful renderings of identical
+            parameters are cached in synthetic_response_cache and reused. A failed parameter set is reported in its
+            entry and does not stop the rest of the campaign.
+        """
+
+        # Start every parameter set from the target without synth objects
+        baseline_params = self.wise_view_parameters.copy()
+        default_params = self.defaultParams()
+        for key in default_params:
+            if (key.startswith("synth_")):
+                baseline_params[key] = default_params[key]
+
+        parameter_sets = self.expandParameterGrid(parameter_grid)
+        campaign_params = [self.fillSyntheticParameters(baseline_params.copy(), **parameter_set) for parameter_set in parameter_sets]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            json_responses = list(executor.map(self.getCachedSyntheticJSONResponse, campaign_params))
+
+            campaign = []
+            for index, parameter_set in enumerate(parameter_sets):
+                if ("ims" not in json_responses[index]):
+                    campaign.append({"parameters": parameter_set, "urls": [], "frames": [], "error": json_responses[index].get("message", str(json_responses[index]))})
+                    continue
+                urls = [self.amnh_base_url + url_ending for url_ending in json_responses[index]["ims"]]
+                campaign.append({"parameters": parameter_set, "urls": urls, "frames": [], "error": None})
+
+            frame_futures = [[executor.submit(self.getPNGDataFromURL, url) for url in entry["urls"]] for entry in campaign]
+
+            for index, entry in enumerate(campaign):
+                if (entry["error"] is not None):
+                    continue
+
+                try:
+                    PNG_data_list = [future.result() for future in frame_futures[index]]
+                except requests.exceptions.RequestException as e:
+                    print(f"The frames of synthetic parameter set {index} could not be downloaded: {e}")
+                    entry["error"] = f"{type(e).__name__}: {e}"
+                    continue
+
+                if (output_directory is None):
+                    entry["frames"] = PNG_data_list
+                    continue
+
+                synth_directory = os.path.join(output_directory, f"synth_{index}")
+                os.makedirs(synth_directory, exist_ok=True)
+                for frame_index, PNG_data in enumerate(PNG_data_list):
+                    field_name = self.field_name_format.format(**campaign_params[index], index=frame_index)
+                    fname_dest = os.path.join(synth_directory, field_name)
+                    with open(fname_dest, 'wb') as file:
+                        file.write(PNG_data)
+                    entry["frames"].append(fname_dest)
+
+        return campaign
+
+    def getCachedSyntheticJSONResponse(self, params):
+        key = tuple(sorted(params.items()))
+        with self.synthetic_response_cache_lock:
+            if (key in self.synthetic_response_cache):
+                self.synthetic_response_cache.move_to_end(key)
+                return self.synthetic_response_cache[key]
+
+        delay = 0
+        failed_attempts = 0
+        while (True):
+            try:
+                json_response = self.getJSONResponse(delay=delay, params=params)
+            except requests.exceptions.RequestException as e:
+                json_response = {"message": f"{type(e).__name__}: {e}"}
+
+            if ("ims" in json_response):
+                break
+
+            # The service being unavailable is retried until it recovers, other failures only a few times
+            message = json_response.get("message", str(json_response))
+            if (message != 'Service Unavailable'):
+                failed_attempts += 1
+                if (failed_attempts > self.synthetic_retry_count):
+                    print(f"WiseView rendering failed: {message}")
+                    return json_response
+
+            delay *= 2
+            if delay == 0:
+                delay = 5
+            elif delay >= 300:
+                delay = 300
+            print(f"WiseView rendering failed ({message}), Retrying in {delay} seconds...")
+
+        # Only renderings are cached, errors are requested again by later calls
+        with self.synthetic_response_cache_lock:
+            self.synthetic_response_cache[key] = json_response
+            self.synthetic_response_cache.move_to_end(key)
+            while (len(self.synthetic_response_cache) > self.synthetic_response_cache_size):
+                self.synthetic_response_cache.popitem(last=False)
+        return json_response
+
+    def injectSyntheticObjects(self, stack, band=2, mjds=None, **kwargs):
+        """
+        Inject synthetic moving objects into local epoch cutouts using the metadata of the current WiseView response,
+        instead of requesting a new rendering from WiseView.
+
+        Parameters
+        ----------
+            stack : array_like
+                Single band epoch cutouts with shape (N, H, W), in FITS orientation, matching this query's field.
+            band : int, optional
+                WISE band of the stack, 1 or 2. Defaults to 2.
+            mjds : array_like, optional
+                MJD of each epoch. Defaults to the all_mjds metadata of the current response.
+            kwargs : keyword arguments
+                Synthetic object parameters ra, dec, w1, w2, pmra, pmdec and mjd, each a scalar or an array with one value
+                per synthetic parameter set. Even if the keyword argument is given in uppercase, it will still work.
+                Defaults:
+                ra = current RA
+                dec = current DEC
+                w1 = 99.0
+                w2 = 13.0
+                pmra = 0
+                pmdec = 0
+                mjd = mjd of the first frame
+
+        Returns
+        -------
+            injected_stack : numpy.ndarray
+                Array of shape (K, N, H, W) with one injected copy of the stack per synthetic parameter set.
+        """
+
+        synthetic_parameters = {
+            "ra": self.wise_view_parameters["ra"],
+            "dec": self.wise_view_parameters["dec"],
+            "w1": 99.0,
+            "w2": 13.0,
+            "pmra": 0,
+            "pmdec": 0,
+            "mjd": None,
+        }
+
+        for key in kwargs:
+            if (key.lower() in synthetic_parameters):
+                synthetic_parameters[key.lower()] = kwargs[key]
+            else:
+                raise KeyError(f"The following key is not a valid parameter: {key}. The available parameters are: {list(synthetic_parameters.keys())}.")
+
+        all_mjds, crpix1, crpix2, crval1, crval2 = self.requestMetadata("all_mjds", "CRPIX1", "CRPIX2", "CRVAL1", "CRVAL2")
+
+        if (mjds is None):
+            mjds = all_mjds
+
+        if (synthetic_parameters["mjd"] is None):
+            synthetic_parameters["mjd"] = all_mjds[0]
+
+        return SyntheticInjection.injectSources(stack, mjds, crpix1, crpix2, crval1, crval2,
+                                                ra=synthetic_parameters["ra"], dec=synthetic_parameters["dec"],
+                                                magnitude=synthetic_parameters[f"w{band}"],
+                                                pmra=synthetic_parameters["pmra"], pmdec=synthetic_parameters["pmdec"],
+                                                reference_mjd=synthetic_parameters["mjd"], band=band)
+
+    def getResponse(self, delay=0, params=None):
+        if (params is None):
+            params = self.wise_view_parameters
         time.sleep(delay)
         try:
-            response = requests.get(self.png_anim, params=self.wise_view_parameters)
+            response = requests.get(self.png_anim, params=params)
             if (response.status_code != 200):
                 print(f"Response Status Code: {response.status_code}")
                 print(f"Response Text: {response.text}")
@@ -201,14 +448,14 @@ class WiseViewQuery:
             elif delay >= 300:
                 delay = 300
             print(f"AWS Connection Reset Error, Retrying in {delay} seconds...")
-            response = self.getResponse(delay=delay)
+            response = self.getResponse(delay=delay, params=params)
             print(f'Success: Response Received')
         return response
 
-    def getJSONResponse(self, delay=0):
+    def getJSONResponse(self, delay=0, params=None):
         time.sleep(delay)
         try:
-            json_response = self.getResponse().json()
+            json_response = self.getResponse(params=params).json()
         except requests.exceptions.JSONDecodeError:
             delay *= 2
             if delay == 0:
@@ -216,7 +463,7 @@ class WiseViewQuery:
             elif delay >= 300:
                 delay = 300
             print(f"Invalid JSON response sent from WiseView, Retrying in {delay} seconds...")
-            json_response = self.getJSONResponse(delay=delay)
+            json_response = self.getJSONResponse(delay=delay, params=params)
             print(f'Success: JSON Response Received')
         return json_response
 
@@ -401,15 +648,18 @@ class WiseViewQuery:
             if (os.path.exists(f)):
                 os.remove(f)
 
-    def downloadPNGs(self, urls, output_directory):
+    def downloadPNGs(self, urls, output_directory, indices=None):
+        if (indices is None):
+            indices = range(len(urls))
+
         try:
             pool = mp.Pool()
-            processes = [pool.apply_async(self.downloadData, args=(urls[i], i, output_directory)) for i in range(len(urls))]
+            processes = [pool.apply_async(self.downloadData, args=(urls[i], i, output_directory)) for i in indices]
             flist = [p.get() for p in processes]
         except Exception as e:
             print("Exception of type " + str(type(e)) + " occurred in downloadPNGs: " + str(e))
             flist = []
-            for i in range(len(urls)):
+            for i in indices:
                 field_name = self.getFilledFieldName(i)
                 fname = os.path.basename(field_name)
                 fname_dest = os.path.join(output_directory, fname)
@@ -417,7 +667,7 @@ class WiseViewQuery:
             self.earlyTerminationProtocol(flist)
         return flist
 
-    def downloadModifiedWiseViewData(self, output_directory, scale_factor=1.0, addGrid=False, gridCount=5, gridType = "Solid", gridColor = (0,0,0)):
+    def downloadModifiedWiseViewData(self, output_directory, scale_factor=1.0, addGrid=False, gridCount=5, gridType = "Solid", gridColor = (0,0,0), incremental=False, materialize_scale=True):
         """
         Generates a set of modified PNG files for the available set of data from WiseView (which is from the unWISE data)
 
@@ -437,6 +687,13 @@ class WiseViewQuery:
                 Intersection, and Dashed. Defaults to Solid.
             gridColor : tuple, optional
                 A 3 integer element tuple which represents the RGB values of the color
+            incremental : bool, optional
+                Keep the unmodified PNG files in a "raw/<request key>" subdirectory of output_directory, keyed on the
+                frame URLs, and on reruns, only download missing raw files and only regenerate outputs whose request or
+                post-processing configuration changed. Defaults to False.
+            materialize_scale : bool, optional
+                If False, the scale factor is recorded as PNG metadata (see PostProcessing.getScaleFactor) instead of
+                writing upscaled PNG files. Defaults to True.
 
         Returns
         -------
@@ -454,24 +711,290 @@ class WiseViewQuery:
 
         urls = self.getURLs()
 
-        flist = self.downloadPNGs(urls, output_directory)
+        functions = [PostProcessing.scaleImage, PostProcessing.applyGridToImage]
+        function_args = [(scale_factor, False, materialize_scale), (addGrid, gridCount, gridType, gridColor)]
+
+        if (incremental):
+            # The frame URLs identify the rendering parameters and the epochs, unlike the field names
+            request_key = PostProcessing.requestKey(urls)
+            raw_directory = PostProcessing.getRawDirectory(output_directory, request_key)
+
+            raw_flist = [os.path.join(raw_directory, self.getFilledFieldName(i)) for i in range(len(urls))]
+            missing_indices = [i for i in range(len(urls)) if not os.path.exists(raw_flist[i])]
+            if (len(missing_indices) > 0):
+                self.downloadPNGs(urls, raw_directory, indices=missing_indices)
+                # downloadPNGs deletes the unfinished files of a failed download
+                if (not all(os.path.exists(raw_file) for raw_file in raw_flist)):
+                    print("The raw WiseView frames could not all be downloaded.")
+                    return [], []
+        else:
+            raw_flist = self.downloadPNGs(urls, output_directory)
+
         size_list = []
-        for f in flist:
+        for f in raw_flist:
             with Image.open(f) as image:
                 width = image.width * scale_factor
                 height = image.height * scale_factor
                 size_list.append((width, height))
 
-        functions = [PostProcessing.scaleImage, PostProcessing.applyGridToImage]
-        function_args = [(scale_factor,), (addGrid, gridCount, gridType, gridColor)]
-        PostProcessing.applyModifications(flist, functions, function_args)
+        if (incremental):
+            flist = PostProcessing.rebuildModifiedFiles(raw_flist, output_directory, functions, function_args, request_key)
+        else:
+            flist = raw_flist
+            PostProcessing.applyModifications(flist, functions, function_args)
 
         return flist, size_list
 
+    def getBundleMetadata(self):
+        """
+        Get the WiseView parameters and the available request metadata, to be stored alongside the frames in a bundle.
+
+        Returns
+        -------
+            metadata : dict
+                Dictionary with the WiseView parameters under "wise_view_parameters" and every available metadata key of
+                requestMetadata except "ims".
+        """
+
+        metadata = {"wise_view_parameters": self.wise_view_parameters}
+        for key in ['min', 'max', 'all_mjds', 'mjds', 'epochs', 'scandirs', 'CRPIX1', 'CRPIX2', 'CRVAL1', 'CRVAL2', 'NAXIS1', 'NAXIS2']:
+            if (key in self.JSONResponse):
+                metadata[key] = self.JSONResponse[key]
+        return metadata
+
+    def getBundleKey(self):
+        return os.path.splitext(self.field_name_format.format(**self.wise_view_parameters, index="ALL"))[0].replace("-INDEX_ALL", "")
+
+    def downloadFlipbookBundle(self, bundle_filepath, key=None, max_workers=8):
+        """
+        Download every frame of the flipbook into a single bundle file instead of one PNG file per frame.
+
+        Parameters
+        ----------
+            bundle_filepath : str or FlipbookBundle.FlipbookBundle
+                Bundle file. If it already exists, the flipbook is added to it, so one bundle can hold a shard of flipbooks.
+                A bundle opened for writing can be given instead, so that a campaign keeps one bundle open per shard and
+                writes a single index for it on close.
+            key : str, optional
+                Name of the flipbook within the bundle. Defaults to the field name without the frame index.
+            max_workers : int, optional
+                Maximum number of concurrent frame downloads. Defaults to 8.
+
+        Returns
+        -------
+            key : str
+                Name of the flipbook within the bundle.
+
+        Notes
+        -----
+            Frames are stored as the PNG bytes received from WiseView, without re-encoding. They can be read back with
+            FlipbookBundle.FlipbookBundle(bundle_filepath).getFrames(key).
+        """
+
+        if (key is None):
+            key = self.getBundleKey()
+
+        urls = self.getURLs()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            PNG_data_list = list(executor.map(self.getPNGDataFromURL, urls))
+
+        if (isinstance(bundle_filepath, FlipbookBundle.FlipbookBundle)):
+            bundle_filepath.addFlipbook(key, PNG_data_list, self.getBundleMetadata())
+        else:
+            with FlipbookBundle.FlipbookBundle(bundle_filepath, mode="a") as bundle:
+                bundle.addFlipbook(key, PNG_data_list, self.getBundleMetadata())
+
+        return key
+
+    def getFrameMJDs(self):
+        """
+        Get one MJD per frame of the flipbook, the mean MJD of the epochs combined in each frame.
+
+        Returns
+        -------
+            frame_mjds : list of float or None
+                MJD of each frame, or None if the response does not provide the mjds metadata.
+        """
+
+        if ("mjds" not in self.JSONResponse):
+            return None
+
+        frame_mjds = []
+        for frame_mjd in self.JSONResponse["mjds"]:
+            if (isinstance(frame_mjd, (list, tuple))):
+                frame_mjds.append(sum(frame_mjd) / len(frame_mjd) if len(frame_mjd) > 0 else None)
+            else:
+                frame_mjds.append(frame_mjd)
+        return frame_mjds
+
+    def createWiseViewSpriteSheet(self, sheet_filepath, columns=None, max_workers=8):
+        """
+        Create one sprite sheet image holding every frame of the flipbook, with a JSON sidecar of the frame offsets and MJDs.
+
+        Parameters
+        ----------
+            sheet_filepath : str
+                Output path filename of the sprite sheet image.
+            columns : int, optional
+                Number of frames per row. Defaults to a roughly square sheet.
+            max_workers : int, optional
+                Maximum number of concurrent frame downloads. Defaults to 8.
+
+        Returns
+        -------
+            sheet_filepath : str
+                Output path filename of the sprite sheet image.
+            sidecar_filepath : str
+                Output path filename of the JSON sidecar.
+
+        Notes
+        -----
+            Frames are decoded in memory, no per-frame files are written.
+        """
+
+        urls = self.getURLs()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            PNG_data_list = list(executor.map(self.getPNGDataFromURL, urls))
+
+        frames = [Image.open(BytesIO(PNG_data)) for PNG_data in PNG_data_list]
+
+        return FlipbookWriter.writeSpriteSheet(frames, sheet_filepath, columns=columns, mjds=self.getFrameMJDs(), metadata=self.getBundleMetadata())
+
+    @staticmethod
+    def decodePNGData(PNG_data):
+        """
+        Decode the bytes of a PNG frame into a NumPy array, without writing it to disk.
+
+        Parameters
+        ----------
+            PNG_data : bytes
+                Encoded PNG frame.
+
+        Returns
+        -------
+            frame_data : numpy.ndarray
+                (H, W, C) uint8 array of the frame, palette frames are converted to RGB.
+        """
+
+        return FlipbookFrame.FlipbookFrame(PNG_data).decode()
+
+    def iterFrames(self, ordered=False, max_workers=8, addGrid=False, gridCount=5, gridType="Solid", gridColor=(0,0,0)):
+        """
+        Download the frames of the flipbook concurrently and yield each one as soon as it is decoded.
+
+        Parameters
+        ----------
+            ordered : bool, optional
+                Yield the frames in display order rather than in completion order. Defaults to False.
+            max_workers : int, optional
+                Maximum number of concurrent frame downloads. Defaults to 8.
+            addGrid : bool, optional
+                Whether to overlay a grid on the decoded frames, with PostProcessing.applyGridToArray. Defaults to False.
+            gridCount : int, optional
+                Number of grid lines to generate on the image (height and width). The default is 5.
+            gridType : str, optional
+                Solid, Intersection, or Dashed. Defaults to Solid.
+            gridColor : tuple, optional
+                Color of the grid lines. Defaults to black.
+
+        Yields
+        ------
+            index : int
+                Index of the frame in the flipbook.
+            mjd : float or None
+                MJD of the frame, see getFrameMJDs.
+            frame_data : numpy.ndarray
+                (H, W, C) array of the frame, decoded from the response bytes.
+
+        Notes
+        -----
+            Closing the generator early cancels the downloads which have not started yet.
+        """
+
+        urls = self.getURLs()
+        frame_mjds = self.getFrameMJDs()
+
+        def fetchFrame(index):
+            frame_data = self.decodePNGData(self.getPNGDataFromURL(urls[index]))
+            if (addGrid):
+                PostProcessing.applyGridToArray(frame_data, gridCount, gridType, gridColor)
+            return index, frame_data
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = [executor.submit(fetchFrame, index) for index in range(len(urls))]
+            for future in (futures if ordered else as_completed(futures)):
+                index, frame_data = future.result()
+                yield index, frame_mjds[index] if frame_mjds is not None else None, frame_data
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def iterFramesAsync(self, ordered=False, max_workers=8, addGrid=False, gridCount=5, gridType="Solid", gridColor=(0,0,0)):
+        """
+        Asynchronous counterpart of iterFrames, for use with "async for" inside an event loop.
+
+        The blocking downloads and decodes run in a thread pool, so the event loop stays responsive while frames are in
+        flight. The parameters and yielded tuples are those of iterFrames.
+        """
+
+        urls = self.getURLs()
+        frame_mjds = self.getFrameMJDs()
+        loop = asyncio.get_running_loop()
+
+        def fetchFrame(index):
+            frame_data = self.decodePNGData(self.getPNGDataFromURL(urls[index]))
+            if (addGrid):
+                PostProcessing.applyGridToArray(frame_data, gridCount, gridType, gridColor)
+            return index, frame_data
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            tasks = [loop.run_in_executor(executor, fetchFrame, index) for index in range(len(urls))]
+            for task in (tasks if ordered else asyncio.as_completed(tasks)):
+                index, frame_data = await task
+                yield index, frame_mjds[index] if frame_mjds is not None else None, frame_data
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def getFrameArray(self, out=None, max_workers=8, addGrid=False, gridCount=5, gridType="Solid", gridColor=(0,0,0)):
+        """
+        Download every frame of the flipbook and decode them into a single (N, H, W, C) array.
+
+        Parameters
+        ----------
+            out : numpy.ndarray, optional
+                Preallocated uint8 array of shape (N, H, W, C) to decode into, which can be reused across flipbooks.
+            max_workers : int, optional
+                Maximum number of concurrent frame downloads. Defaults to 8.
+            addGrid : bool, optional
+                Whether to overlay a grid on the decoded frames, with PostProcessing.applyGridToArray. Defaults to False.
+            gridCount : int, optional
+                Number of grid lines to generate on the image (height and width). The default is 5.
+            gridType : str, optional
+                Solid, Intersection, or Dashed. Defaults to Solid.
+            gridColor : tuple, optional
+                Color of the grid lines. Defaults to black.
+
+        Returns
+        -------
+            frames_data : numpy.ndarray
+                (N, H, W, C) uint8 array of the frames, in display order.
+        """
+
+        urls = self.getURLs()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            PNG_data_list = list(executor.map(self.getPNGDataFromURL, urls))
+
+        frames_data = FlipbookFrame.FlipbookFrame.decodeBatch(PNG_data_list, out=out)
+        if (addGrid):
+            # One broadcast assignment grids the whole batch
+            PostProcessing.applyGridToArray(frames_data, gridCount, gridType, gridColor)
+        return frames_data
+
     @classmethod
-    def createGIF(cls, flist, gif_filepath, duration=0.2, scale_factor=1.0):
+    def createGIF(cls, flist, gif_filepath, duration=0.2, scale_factor=1.0, encoder="global_palette", output_format="gif"):
         """
-        Construct a GIF animation from a list of PNG files.
+        Construct a GIF (or other animation format) from a list of PNG files.
 
         Parameters
         ----------
@@ -484,6 +1007,12 @@ class WiseViewQuery:
                 Time interval in seconds for each frame in the GIF blink (?).
             scale_factor : float, optional
                 PNG image size scaling factor
+            encoder : str, optional
+                "global_palette" uses FlipbookWriter.writeGIF, which shares one palette between all frames, while
+                "imageio" quantizes every frame independently with imageio. Defaults to "global_palette".
+            output_format : str, optional
+                Animation format, one of "gif", "apng", "webp" or "webp-lossy". The encoder only applies to "gif".
+                Defaults to "gif".
 
         Notes
         -----
@@ -492,19 +1021,21 @@ class WiseViewQuery:
 
         """
 
-        import imageio
+        if (encoder not in ["global_palette", "imageio"]):
+            raise ValueError(f"Invalid GIF encoder: {encoder}. The available encoders are: global_palette, imageio.")
 
         # add checks on whether the files in flist actually exist?
 
-        # Rescales PNGs
+        # Rescales PNGs, integer factors take the pixel repetition path of PostProcessing.upscaleImage
         if (scale_factor != 1.0):
             for f in flist:
-                with Image.open(f) as im:
-                    size = im.size
-                    width = size[0]
-                    height = size[1]
-                    rescaled_size = (width * scale_factor, height * scale_factor)
-                    PostProcessing.resizeImage(f, rescaled_size)
+                PostProcessing.rescale(f, scale_factor, allow_non_integer_scaling=True)
+
+        if (encoder == "global_palette" or output_format != "gif"):
+            FlipbookWriter.writeAnimation(flist, gif_filepath, duration=duration, output_format=output_format)
+            return
+
+        import imageio
 
         images = []
         for f in flist:
@@ -512,7 +1043,7 @@ class WiseViewQuery:
 
         imageio.mimsave(gif_filepath, images, duration=duration)
 
-    def createWiseViewGIF(self, output_directory, gif_filepath, duration=0.2, scale_factor=1.0, delete_pngs=True):
+    def createWiseViewGIF(self, output_directory, gif_filepath, duration=0.2, scale_factor=1.0, delete_pngs=True, output_format="gif"):
         """
         Create one WiseView animation at a desired central sky location.
 
@@ -528,6 +1059,8 @@ class WiseViewQuery:
                 Frame image size scaling factor.
             delete_pngs : bool, optional
                 Delete downloaded PNGs after having used them to construct the GIF.
+            output_format : str, optional
+                Animation format, one of "gif", "apng", "webp" or "webp-lossy". Defaults to "gif".
 
         Notes
         -----
@@ -557,7 +1090,7 @@ class WiseViewQuery:
             flist.append(fname_dest)
             counter += 1
 
-        self.createGIF(flist, gif_filepath, duration=duration, scale_factor=scale_factor)
+        self.createGIF(flist, gif_filepath, duration=duration, scale_factor=scale_factor, output_format=output_format)
 
         if delete_pngs:
             print('Cleaning up...')
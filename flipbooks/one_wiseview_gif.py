@@ -15,7 +15,7 @@ if __name__=="__main__":
                         help="Dec in decimal degrees.")
 
     parser.add_argument('gifname', type=str,
-                        help="Name of output GIF animation file.")
+                        help="Name of output animation file.")
 
     parser.add_argument('--outdir', type=str, default='.',
                         help="Output directory for PNGs.")
@@ -29,10 +29,14 @@ if __name__=="__main__":
     parser.add_argument('--duration', type=float, default=0.2,
                         help="Time in seconds per frame.")
 
+    parser.add_argument('--format', type=str, default='gif',
+                        choices=['gif', 'apng', 'webp', 'webp-lossy'],
+                        help="Animation output format.")
+
     parser.add_argument('--keep_pngs', default=False,
                         action='store_true',
                         help="Retain the PNGs after the GIF has been built?")
 
     args = parser.parse_args()
     wise_view_query = WiseViewQuery.WiseViewQuery(ra=args.ra[0],dec=args.dec[0],minbright=args.minbright,maxbright=args.maxbright)
-    wise_view_query.createWiseViewGIF(args.outdir, args.gifname, duration=args.duration, scale_factor=1, delete_pngs=(not args.keep_pngs))
+    wise_view_query.createWiseViewGIF(args.outdir, args.gifname, duration=args.duration, scale_factor=1, delete_pngs=(not args.keep_pngs), output_format=args.format)
@@ -6,7 +6,7 @@ import astropy.io.fits as fits
 from astropy.visualization import AsinhStretch, LinearStretch
 import numpy
 import numpy as np
-from flipbooks import WiseViewQuery
+from flipbooks import WiseViewQuery, PostProcessing
 import matplotlib.pyplot as plt
 from PIL import Image
 import tarfile
@@ -16,6 +16,9 @@ unWISE_pixel_scale = 2.75
 
 class unWISEQuery:
 
+    # Footprint map accumulating every observed response, see setFootprintMap
+    footprint_map = None
+
     def __init__(self, **kwargs):
         self.unWISE_parameters = self.customParams(**kwargs)
         self.filenames = self.request_unWISE_FITS()
@@ -100,6 +103,31 @@ class unWISEQuery:
 
         return unWISE_query_url
 
+    @classmethod
+    def setFootprintMap(cls, footprint_map):
+        """
+        Set the footprint map into which every unWISE cutout response is accumulated, or None to disable it.
+
+        Parameters
+        ----------
+            footprint_map : FootprintMap.FootprintMap or None
+                The footprint map. Coverage is recorded under the "unwise-<version>" layer, such as "unwise-neo7", the
+                same identifiers as the unWISE layers of the Legacy Survey.
+        """
+
+        cls.footprint_map = footprint_map
+
+    def recordResponse(self, response):
+        """
+        Add a cutout response to the footprint map, if it shows whether this version has data at the position.
+        """
+
+        if (self.footprint_map is None):
+            return
+
+        if (response.ok or response.status_code == 404):
+            self.footprint_map.addObservations(f"unwise-{self.unWISE_parameters['version']}", self.unWISE_parameters["ra"], self.unWISE_parameters["dec"], response.ok)
+
     def request_unWISE_FITS(self, delay=0):
         unWISE_query_url = self.generateRequestURL()
         filenames = []
@@ -107,6 +135,7 @@ class unWISEQuery:
         id = hash((self.unWISE_parameters["version"], self.unWISE_parameters["ra"], self.unWISE_parameters["dec"], self.unWISE_parameters["size"], self.unWISE_parameters["bands"]))
         try:
             unWISE_response = requests.get(unWISE_query_url)
+            self.recordResponse(unWISE_response)
             with open(f"unWISE_zipped_folder_{id}.tar.gz", 'wb') as f:
                 f.write(unWISE_response.content)
             with tarfile.open(f"unWISE_zipped_folder_{id}.tar.gz", "r:gz") as tar:
@@ -154,37 +183,100 @@ class unWISEQuery:
 
         return filenames
 
-    def getImageData(self, flist):
-        w1_image_data = None
-        w2_image_data = None
+    @classmethod
+    def selectImageHDUs(cls, flist):
+        """
+        Select the FITS file and HDU holding the image data for each band, reading only the headers.
+
+        Parameters
+        ----------
+            flist : list
+                List of FITS filenames returned by request_unWISE_FITS.
+
+        Returns
+        -------
+            selection : dict
+                Dictionary mapping "w1" and "w2" to a (filename, hdu_index) tuple, or None if no image was found for that band.
+
+        Notes
+        -----
+            A square 2D image is preferred. If a band has no square image, the first 2D image found for that band is used
+            instead. Every file is opened once and no data arrays are loaded.
+        """
+
+        square_selection = {"w1": None, "w2": None}
+        fallback_selection = {"w1": None, "w2": None}
         for filename in flist:
             if ("w1" in filename):
-                with fits.open(filename, memmap=False) as w1_fits:
-                    if(w1_fits[0].data.shape[0] == w1_fits[0].data.shape[1]):
-                        w1_image_data = w1_fits[0].data
-
+                band = "w1"
             elif ("w2" in filename):
-                with fits.open(filename, memmap=False) as w2_fits:
-                    if (w2_fits[0].data.shape[0] == w2_fits[0].data.shape[1]):
-                        w2_image_data = w2_fits[0].data
-
-        if(w1_image_data is None):
-            for filename in flist:
-                if ("w1" in filename):
-                    with fits.open(filename, memmap=False) as w1_fits:
-                        w1_image_data = w1_fits[0].data
-                        break
-        if(w2_image_data is None):
-            for filename in flist:
-                if ("w2" in filename):
-                    with fits.open(filename, memmap=False) as w2_fits:
-                        w2_image_data = w2_fits[0].data
+                band = "w2"
+            else:
+                continue
+
+            if (square_selection[band] is not None):
+                continue
+
+            with fits.open(filename, memmap=True, lazy_load_hdus=True) as hdul:
+                for hdu_index, hdu in enumerate(hdul):
+                    header = hdu.header
+                    if (header.get("NAXIS", 0) != 2):
+                        continue
+
+                    if (fallback_selection[band] is None):
+                        fallback_selection[band] = (filename, hdu_index)
+
+                    if (header["NAXIS1"] == header["NAXIS2"]):
+                        square_selection[band] = (filename, hdu_index)
                         break
 
+        selection = {}
+        for band in square_selection:
+            if (square_selection[band] is not None):
+                selection[band] = square_selection[band]
+            else:
+                selection[band] = fallback_selection[band]
+
+        return selection
+
+    def getImageData(self, flist, memmap=False):
+        """
+        Load the W1 and W2 image data from the extracted unWISE FITS files and delete the files afterwards.
+
+        Parameters
+        ----------
+            flist : list
+                List of FITS filenames returned by request_unWISE_FITS.
+            memmap : bool, optional
+                Memory-map the selected image data instead of copying it into memory. Defaults to False.
+
+        Returns
+        -------
+            w1_image_data, w2_image_data : numpy.ndarray
+                Image data of the W1 and W2 bands, or None if the band was not available.
+
+        Notes
+        -----
+            Removing a memory-mapped file does not invalidate the mapping on POSIX systems, so the files are deleted in
+            either case.
+        """
+
+        selection = self.selectImageHDUs(flist)
+
+        image_data = {}
+        for band in selection:
+            image_data[band] = None
+            if (selection[band] is None):
+                continue
+
+            filename, hdu_index = selection[band]
+            with fits.open(filename, memmap=memmap, lazy_load_hdus=True) as hdul:
+                image_data[band] = hdul[hdu_index].data
+
         for filename in flist:
             os.remove(filename)
 
-        return w1_image_data, w2_image_data
+        return image_data["w1"], image_data["w2"]
 
     def calculateBrightnessClip(self, mode = "percentile", **kwargs):
         """
@@ -356,7 +448,7 @@ class unWISEQuery:
     @classmethod
     # save an RGB image array to a file
     def saveImage(cls, image_data, filename):
-        Image.fromarray(np.array(255 * numpy.flipud(image_data), dtype=np.uint8)).save(filename)
+        PostProcessing.saveImage(Image.fromarray(np.array(255 * numpy.flipud(image_data), dtype=np.uint8)), filename)
 
     @classmethod
     def FOVToPixelSize(cls, FOV):
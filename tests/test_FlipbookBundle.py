@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+
+from flipbooks.FlipbookBundle import FlipbookBundle
+
+def makeFrames(count, value=0):
+    return [np.full((4, 4, 3), (value + index) % 256, dtype=np.uint8) for index in range(count)]
+
+def test_append_keeps_existing_bytes(tmp_path):
+    bundle_filepath = str(tmp_path / "shard.fb")
+    with FlipbookBundle(bundle_filepath, "w") as bundle:
+        bundle.addFlipbook("a", makeFrames(3))
+    with open(bundle_filepath, "rb") as bundle_file:
+        original_bytes = bundle_file.read()
+
+    with FlipbookBundle(bundle_filepath, "a") as bundle:
+        bundle.addFlipbook("b", makeFrames(3, 100))
+
+    with open(bundle_filepath, "rb") as bundle_file:
+        assert bundle_file.read().startswith(original_bytes)
+    with FlipbookBundle(bundle_filepath) as bundle:
+        assert bundle.keys() == ["a", "b"]
+        assert bundle.getFrame("b", 1)[0, 0, 0] == 101
+        assert bundle.getFrames("a").shape == (3, 4, 4, 3)
+
+def test_repeated_appends_grow_linearly(tmp_path):
+    bundle_filepath = str(tmp_path / "shard.fb")
+    frame_bytes = [bytes([index]) * 69 for index in range(8)]
+
+    sizes = {}
+    for count in range(1, 401):
+        with FlipbookBundle(bundle_filepath, "a") as bundle:
+            bundle.addFlipbook(f"flipbook_{count}", frame_bytes)
+        if (count in (100, 400)):
+            sizes[count] = os.path.getsize(bundle_filepath)
+
+    # Each append only adds its frames, a delta index and a trailer
+    growth_per_append = (sizes[400] - sizes[100]) / 300
+    assert growth_per_append < 2 * 8 * 69
+    assert abs(sizes[100] * 4 - sizes[400]) < 0.05 * sizes[400]
+
+    with FlipbookBundle(bundle_filepath) as bundle:
+        assert len(bundle.keys()) == 400
+        assert bundle.getFrameBytes("flipbook_250", 3) == frame_bytes[3]
+
+def test_interrupted_append_reads_previous_index(tmp_path):
+    bundle_filepath = str(tmp_path / "shard.fb")
+    with FlipbookBundle(bundle_filepath, "w") as bundle:
+        bundle.addFlipbook("a", makeFrames(2))
+    with FlipbookBundle(bundle_filepath, "a") as bundle:
+        bundle.addFlipbook("b", makeFrames(2))
+    with open(bundle_filepath, "ab") as bundle_file:
+        bundle_file.write(b"\x00" * 500)
+
+    with FlipbookBundle(bundle_filepath) as bundle:
+        assert bundle.keys() == ["a", "b"]
@@ -0,0 +1,13 @@
+import pytest
+
+from flipbooks.LegacySurveyQuery import LegacySurveyQuery, LegacySurveyQuerySpec
+
+@pytest.mark.parametrize("ra, dec", [(0.0, 5.0), (10.0, 0.0), (0, 0), (133.786245, -7.244372)])
+def test_spec_urls_match_query_urls(ra, dec):
+    spec = LegacySurveyQuerySpec(ra=1.0, dec=1.0)
+    query = LegacySurveyQuery(ra=ra, dec=dec)
+
+    assert spec.getURL(ra, dec, "fits") == query.getFITSCutoutURL()
+    assert spec.getURL(ra, dec, "jpeg") == query.getJPGCutoutURL()
+    assert spec.getQuery(ra, dec).getFITSCutoutURL() == query.getFITSCutoutURL()
+    assert f"ra={ra}&" in query.getFITSCutoutURL()
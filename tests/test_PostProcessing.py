@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from flipbooks import PostProcessing
+
+def gridMask(height, width):
+    return PostProcessing.getGridMaskArray(width, height, 4, "Solid")
+
+@pytest.mark.parametrize("shape, expected", [
+    ((2, 32, 32, 4), (255, 0, 0, 255)),
+    ((2, 32, 32, 3), (255, 0, 0)),
+    ((2, 32, 32, 2), (76, 255)),
+    ((2, 32, 32, 1), (76,)),
+    ((32, 32, 4), (255, 0, 0, 255)),
+    ((32, 32, 3), (255, 0, 0)),
+])
+def test_applyGridToArray_channels(shape, expected):
+    frames = np.full(shape, 7, dtype=np.uint8)
+    PostProcessing.applyGridToArray(frames, 4, "Solid", (255, 0, 0))
+
+    mask = gridMask(32, 32)
+    assert mask.any()
+    assert (frames[..., mask, :] == np.array(expected, dtype=np.uint8)).all()
+    assert (frames[..., ~mask, :] == 7).all()
+
+def test_applyGridToArray_grayscale_2d():
+    frame = np.full((32, 32), 7, dtype=np.uint8)
+    PostProcessing.applyGridToArray(frame, 4, "Solid", (255, 255, 255))
+
+    mask = gridMask(32, 32)
+    assert (frame[mask] == 255).all()
+    assert (frame[~mask] == 7).all()
+
+def test_applyGridToArray_explicit_alpha():
+    frames = np.zeros((1, 32, 32, 4), dtype=np.uint8)
+    PostProcessing.applyGridToArray(frames, 4, "Solid", (0, 255, 0, 128))
+
+    assert (frames[..., gridMask(32, 32), :] == np.array((0, 255, 0, 128), dtype=np.uint8)).all()
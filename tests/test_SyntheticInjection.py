@@ -0,0 +1,22 @@
+import numpy as np
+
+from flipbooks import SyntheticInjection
+
+def test_magnitude_sweep_at_fixed_position():
+    stack = np.zeros((3, 64, 64))
+    mjds = np.array([57000.0, 57180.0, 57360.0])
+    magnitudes = np.array([12.0, 13.0, 14.0])
+
+    model = SyntheticInjection.injectSources(stack, mjds, 32.5, 32.5, 10, 0, 10, 0, magnitudes, return_model=True)
+
+    assert model.shape == (3, 3, 64, 64)
+    total_flux = model.sum(axis=(2, 3))[:, 0]
+    assert np.allclose(total_flux[:-1] / total_flux[1:], 10 ** 0.4)
+
+def test_positions_and_magnitudes_broadcast_together():
+    stack = np.zeros((2, 32, 32))
+    mjds = np.array([57000.0, 57180.0])
+
+    model = SyntheticInjection.injectSources(stack, mjds, 16.5, 16.5, 10, 0, np.array([10.0, 10.001]), 0, 13.0, return_model=True)
+
+    assert model.shape == (2, 2, 32, 32)